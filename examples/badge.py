@@ -1,5 +1,6 @@
 import badger2040
 import jpegdec
+from textwidth import TextWidths
 
 
 # Global Constants
@@ -31,14 +32,9 @@ DEFAULT_TEXT = """
 
 
 # Reduce the size of a string until it fits within a given width
-def truncatestring(text, text_size, width):
-    while True:
-        length = display.measure_text(text, text_size)
-        if length > 0 and length > width:
-            text = text[:-1]
-        else:
-            text += ""
-            return text
+def truncatestring(text, font, text_size, width):
+    widths.use(font, text_size)
+    return widths.fit(text, width)
 
 
 # ------------------------------
@@ -117,6 +113,7 @@ display.set_update_speed(badger2040.UPDATE_NORMAL)
 display.set_thickness(2)
 
 jpeg = jpegdec.JPEG(display.display)
+widths = TextWidths(display)
 
 # Open the badge file
 try:
@@ -136,16 +133,16 @@ detail2_title = badge.readline()  # "E ink"
 detail2_text = badge.readline()   # "296x128px"
 badge_image = badge.readline()    # /badges/badge.jpg
 
-# Truncate all of the text (except for the name as that is scaled)
-company = truncatestring(company, COMPANY_TEXT_SIZE, TEXT_WIDTH)
+# Truncate all of the text (except for the name as that is scaled), measuring in the font it is drawn with
+company = truncatestring(company, "serif", COMPANY_TEXT_SIZE, TEXT_WIDTH)
 
-detail1_title = truncatestring(detail1_title, DETAILS_TEXT_SIZE, TEXT_WIDTH)
-detail1_text = truncatestring(detail1_text, DETAILS_TEXT_SIZE,
-                              TEXT_WIDTH - DETAIL_SPACING - display.measure_text(detail1_title, DETAILS_TEXT_SIZE))
+detail1_title = truncatestring(detail1_title, "sans", DETAILS_TEXT_SIZE, TEXT_WIDTH)
+detail1_text = truncatestring(detail1_text, "sans", DETAILS_TEXT_SIZE,
+                              TEXT_WIDTH - DETAIL_SPACING - widths.measure(detail1_title))
 
-detail2_title = truncatestring(detail2_title, DETAILS_TEXT_SIZE, TEXT_WIDTH)
-detail2_text = truncatestring(detail2_text, DETAILS_TEXT_SIZE,
-                              TEXT_WIDTH - DETAIL_SPACING - display.measure_text(detail2_title, DETAILS_TEXT_SIZE))
+detail2_title = truncatestring(detail2_title, "sans", DETAILS_TEXT_SIZE, TEXT_WIDTH)
+detail2_text = truncatestring(detail2_text, "sans", DETAILS_TEXT_SIZE,
+                              TEXT_WIDTH - DETAIL_SPACING - widths.measure(detail2_title))
 
 
 # ------------------------------
@@ -9,9 +9,9 @@ WIDTH, HEIGHT = display.get_bounds()
 
 if badger2040.is_wireless():
     import ntptime
+    import wifi
     try:
-        display.connect()
-        if display.isconnected():
+        if wifi.ensure_connected(status_handler=display.status_handler):
             ntptime.settime()
             badger2040.pico_rtc_to_pcf()
     except (RuntimeError, OSError) as e:
@@ -1,9 +1,14 @@
 import badger2040
 import gc
+import os
+import struct
+import time
 import badger_os
+import trace
+from textwidth import TextWidths
 
-# **** Put the name of your text file here *****
-text_file = "/books/289-0-wind-in-the-willows-abridged.txt"  # File must be on the MicroPython device
+# **** Put your text files (.txt) in this directory on the MicroPython device *****
+BOOK_DIR = "/books"
 
 gc.collect()
 
@@ -21,6 +26,34 @@ TEXT_WIDTH = WIDTH - TEXT_PADDING - TEXT_PADDING - ARROW_WIDTH
 
 FONTS = ["sans", "gothic", "cursive", "serif"]
 THICKNESSES = [2, 1, 1, 2]
+
+# Page start offsets are kept on flash, one index file per (book, font, text size).
+# Only the open book's index for the current font and size is loaded into RAM.
+# Each file starts with a header: the magic, the layout version, and the book's size and mtime.
+# An index whose header doesn't match, because the book or the layout rules have changed, is
+# rebuilt, and the saved page cache with it. Bump INDEX_VERSION whenever the layout changes
+INDEX_DIR = "/state/ebook"
+INDEX_MAGIC = b"BIX"
+INDEX_VERSION = 1
+INDEX_HEADER = "<3sBII"        # Magic, version, book size, book mtime
+INDEX_HEADER_SIZE = struct.calcsize(INDEX_HEADER)
+INDEX_ENTRY = 4                # Bytes per page offset (little-endian uint32)
+INDEX_BUDGET_MS = 400          # Time spent extending the index after each page turn
+
+READ_BUFFER_SIZE = 2048        # Bytes of the book read from flash at a time
+
+# Laid out pages kept around the current one, so turning back and forth skips the layout.
+# They are saved to /state with the reading position. Set to 0 to turn the cache off
+PAGE_CACHE_PAGES = 5
+
+# A book can come with a pre-paginated copy made by tools/ebook_pack.py, saved next to it
+# with this extension. Pages are then drawn straight from its page table with no layout at all
+PACK_EXTENSION = ".bpk"
+PACK_MAGIC = b"BPK1"
+PACK_ROW = 6                   # Bytes per row in a packed page (uint32 offset, uint16 length)
+
+# Characters the fonts cannot draw, and what to draw instead
+QUOTES = (("\u201c", "\""), ("\u201d", "\""), ("\u2019", "'"))
 # ------------------------------
 #      Drawing functions
 # ------------------------------
@@ -62,117 +95,501 @@ def draw_frame():
 #        Program setup
 # ------------------------------
 
+# Name of the state file holding a book's page, font and size. The prefix keeps it clear of
+# the reader's own files, such as ebook_pages
+def book_state_name(book):
+    return "ebook_book_" + book.rsplit(".", 1)[0]
+
+
 # Global variables
-state = {
-    "last_offset": 0,
-    "current_page": 0,
-    "font_idx": 0,
-    "text_size": 0.5,
-    "offsets": []
+# The library only remembers which book is open. Each book keeps its own page, font and size
+library = {
+    "book": ""
 }
-badger_os.state_load("ebook", state)
-
-text_spacing = int(34 * state["text_size"])
+badger_os.state_load("ebook", library)
+
+# Older versions read a single book and kept its reading position here. Move that into the
+# book's own state, so the reader opens where it was left
+OLD_BOOK = "289-0-wind-in-the-willows-abridged.txt"
+if "current_page" in library:
+    old = {}
+    for key in ("current_page", "font_idx", "text_size"):
+        if key in library:
+            old[key] = library[key]
+    badger_os.state_modify(book_state_name(library["book"] or OLD_BOOK), old)
+    if not library["book"]:
+        library["book"] = OLD_BOOK
+    for key in ("last_offset", "current_page", "font_idx", "text_size", "offsets"):
+        library.pop(key, None)
+    badger_os.state_save("ebook", library)
+
+books = []
+try:
+    books = sorted([f for f in os.listdir(BOOK_DIR) if f.endswith(".txt")])
+except OSError:
+    pass
 
 
 # Create a new Badger and set it to update FAST
-display = badger2040.Badger2040()
+display = trace.display(badger2040.Badger2040(), "ebook")
 display.led(128)
 display.set_update_speed(badger2040.UPDATE_FAST)
 
+widths = TextWidths(display)
+
+
+# ------------------------------
+#         Book reader
+# ------------------------------
+
+# Splits the book into words through a fixed, reusable read buffer, so a page
+# turn costs one flash read per buffer rather than a readline and seek per word
+class WordReader:
+    def __init__(self, f, size):
+        self.f = f
+        self.buf = bytearray(size)
+        self.base = 0   # File offset of the first byte in the buffer
+        self.start = 0  # Next unread byte in the buffer
+        self.end = 0    # Number of valid bytes in the buffer
+        f.seek(0)
+
+    def tell(self):
+        return self.base + self.start
+
+    def seek(self, pos):
+        # Stay within the buffered data if we can, otherwise start afresh from the file
+        if self.base <= pos <= self.base + self.end:
+            self.start = pos - self.base
+        else:
+            self.f.seek(pos)
+            self.base = pos
+            self.start = 0
+            self.end = 0
+
+    # Read a span of the book, straight from the buffer if it is already there
+    def read(self, offset, length):
+        if self.base <= offset and offset + length <= self.base + self.end:
+            start = offset - self.base
+            return bytes(self.buf[start:start + length])
+        self.f.seek(offset)
+        data = self.f.read(length)
+        self.f.seek(self.base + self.end)
+        return data
+
+    # Move the unread bytes to the front of the buffer and top it up from the file
+    def fill(self):
+        remaining = self.end - self.start
+        if self.start > 0:
+            self.buf[:remaining] = self.buf[self.start:self.end]
+            self.base += self.start
+            self.start = 0
+            self.end = remaining
+        read = self.f.readinto(memoryview(self.buf)[self.end:])
+        if read:
+            self.end += read
+        return read
+
+    # Return the next word, and the offset of the byte after it and its separating space or new line.
+    # An empty word means a blank line (or the end of the book)
+    def next_word(self):
+        i = self.start
+        while True:
+            buf = self.buf
+            end = self.end
+            while i < end and buf[i] != 32 and buf[i] != 10:
+                i += 1
+            if i < end:
+                word = bytes(buf[self.start:i])
+                self.start = i + 1
+                return word, self.tell()
+
+            if self.start == 0 and end == len(buf):
+                # The word fills the whole buffer, so hand it back in pieces, cut before
+                # the character at the end in case some of its bytes are still to come
+                i = end
+                while i > end - 3 and buf[i - 1] & 0xC0 == 0x80:
+                    i -= 1
+                if buf[i - 1] >= 0xC0:
+                    i -= 1
+                if i == 0 or buf[end - 1] < 0x80:
+                    i = end
+                word = bytes(buf[:i])
+                self.start = i
+                return word, self.tell()
+
+            i -= self.start
+            if not self.fill():
+                word = bytes(buf[self.start:self.end])
+                self.start = self.end
+                return word, self.tell()
+
 
 # ------------------------------
 #         Render page
 # ------------------------------
 
-def render_page():
+# Decode text from the book and swap out the characters the fonts cannot draw.
+# Books that aren't valid UTF-8 are read as ASCII, dropping the bytes beyond it
+def plain_text(data):
+    try:
+        text = data.decode()
+    except UnicodeError:
+        text = bytes(c for c in data if c < 128).decode()
+    for quote, plain in QUOTES:
+        if quote in text:
+            text = text.replace(quote, plain)
+    return text
+
+
+# Lay out one page from the reader's position without drawing anything.
+# Returns the page's rows as a flat list of (offset, length) pairs into the book, with a length of
+# 0 for a blank row, and leaves the reader at the start of the next page
+def layout_page():
+    rows = []
     row = 0
-    line = ""
-    pos = ebook.tell()
-    next_pos = pos
+    line_start = -1  # Offset of the first word on the line, -1 while the line is empty
+    line_end = 0
+    line_length = 0
+    pos = reader.tell()
     add_newline = False
-    display.set_font(FONTS[state["font_idx"]])
-    display.set_thickness(THICKNESSES[state["font_idx"]])
+    widths.use(FONTS[state["font_idx"]], state["text_size"])
 
     while True:
-        # Read a full line and split it into words
-        words = ebook.readline().split(" ")
-
-        # Take the length of the first word and advance our position
-        next_word = words[0]
-        if len(words) > 1:
-            next_pos += len(next_word) + 1
-        else:
-            next_pos += len(next_word)  # This is the last word on the line
-
-        # Advance our position further if the word contains special characters
-        if '\u201c' in next_word:
-            next_word = next_word.replace('\u201c', '\"')
-            next_pos += 2
-        if '\u201d' in next_word:
-            next_word = next_word.replace('\u201d', '\"')
-            next_pos += 2
-        if '\u2019' in next_word:
-            next_word = next_word.replace('\u2019', '\'')
-            next_pos += 2
-
-        # Rewind the file back from the line end to the start of the next word
-        ebook.seek(next_pos)
+        # Take the next word from the read buffer, along with the byte offset just past it
+        raw_word, next_pos = reader.next_word()
 
         # Strip out any new line characters from the word
-        next_word = next_word.strip()
+        next_word = plain_text(raw_word).strip()
 
         # If an empty word is encountered assume that means there was a blank line
         if len(next_word) == 0:
             add_newline = True
 
-        # Append the word to the current line and measure its length
-        appended_line = line
-        if len(line) > 0 and len(next_word) > 0:
-            appended_line += " "
-        appended_line += next_word
-        appended_length = display.measure_text(appended_line, state["text_size"])
+        # Add the word's cached width to the line's length
+        appended_length = line_length
+        if len(next_word) > 0:
+            if line_start >= 0:
+                appended_length += widths.space
+            appended_length += widths.measure(next_word)
 
         # Would this appended line be longer than the text display area, or was a blank line spotted?
         if appended_length >= TEXT_WIDTH or add_newline:
 
-            # Yes, so write out the line prior to the append
-            print(line)
-            display.set_pen(0)
-            display.text(line, TEXT_PADDING, (row * text_spacing) + (text_spacing // 2) + TEXT_PADDING, WIDTH, state["text_size"])
-
-            # Clear the line and move on to the next row
-            line = ""
+            # Yes, so end the line prior to the append
+            if line_start >= 0:
+                rows.append(line_start)
+                rows.append(line_end - line_start)
+            else:
+                rows.append(pos)
+                rows.append(0)
             row += 1
 
             # Have we reached the end of the page?
             if (row * text_spacing) + text_spacing >= HEIGHT:
-                print("+++++")
-                display.update()
-
                 # Reset the position to the start of the word that made this line too long
-                ebook.seek(pos)
-                return
+                reader.seek(pos)
+                return rows
             else:
-                # Set the line to the word and advance the current position
-                line = next_word
+                # Start the next line with the word and advance the current position
+                if len(next_word) > 0:
+                    line_start = pos
+                    line_end = pos + len(raw_word)
+                    line_length = widths.measure(next_word)
+                else:
+                    line_start = -1
+                    line_length = 0
                 pos = next_pos
 
             # A new line was spotted, so advance a row
             if add_newline:
-                print("")
+                rows.append(pos)
+                rows.append(0)
                 row += 1
                 if (row * text_spacing) + text_spacing >= HEIGHT:
-                    print("+++++")
-                    display.update()
-                    return
+                    return rows
                 add_newline = False
         else:
-            # The appended line was not too long, so set it as the line and advance the current position
-            line = appended_line
+            # The appended line was not too long, so add the word to it and advance the current position
+            if len(next_word) > 0:
+                if line_start < 0:
+                    line_start = pos
+                line_end = pos + len(raw_word)
+            line_length = appended_length
             pos = next_pos
 
 
+# Draw a laid out page. The page's text is read from the book in one go
+def draw_rows(rows):
+    display.set_font(FONTS[state["font_idx"]])
+    display.set_thickness(THICKNESSES[state["font_idx"]])
+    display.set_pen(0)
+
+    start = end = -1
+    for i in range(0, len(rows), 2):
+        if rows[i + 1] > 0:
+            if start < 0:
+                start = rows[i]
+            end = rows[i] + rows[i + 1]
+    if start < 0:
+        return
+    text = reader.read(start, end - start)
+
+    for i in range(0, len(rows), 2):
+        if rows[i + 1] > 0:
+            offset = rows[i] - start
+            line = " ".join(plain_text(text[offset:offset + rows[i + 1]]).split())
+            row = i // 2
+            display.text(line, TEXT_PADDING, (row * text_spacing) + (text_spacing // 2) + TEXT_PADDING, WIDTH, state["text_size"])
+
+
+# Draw the current page, reusing its layout from the page cache when we have it
+def render_page():
+    page = state["current_page"]
+    if packed:
+        rows = pack_rows(page)
+    else:
+        rows = page_cache.get(str(page))
+    if rows is None:
+        reader.seek(page_offset(page))
+        rows = layout_page()
+        cache_page(page, rows)
+    draw_rows(rows)
+    display.update()
+
+
+# ------------------------------
+#          Page cache
+# ------------------------------
+
+# Keep a page's layout
+def cache_page(page, rows):
+    if PAGE_CACHE_PAGES > 0:
+        page_cache[str(page)] = rows
+        trim_page_cache()
+
+
+# Drop pages that are too far from the current one
+def trim_page_cache():
+    for key in list(page_cache.keys()):
+        if abs(int(key) - state["current_page"]) > PAGE_CACHE_PAGES // 2:
+            del page_cache[key]
+
+
+# Lay out the pages either side of the current one, so the next turn in either direction is ready
+def cache_neighbours():
+    if PAGE_CACHE_PAGES == 0 or packed:
+        return
+    for page in (state["current_page"] + 1, state["current_page"] - 1):
+        if page >= 0 and str(page) not in page_cache and has_page(page):
+            reader.seek(page_offset(page))
+            cache_page(page, layout_page())
+
+
+# Load the page cache saved before the last halt, if it is for the current book, font and size
+def load_page_cache():
+    global page_cache
+    page_cache = {}
+    if PAGE_CACHE_PAGES > 0 and not packed:
+        saved = {"index": "", "stamp": None, "pages": {}}
+        badger_os.state_load("ebook_pages", saved)
+        if saved["index"] == index_file and saved["stamp"] == book_stamp:
+            page_cache = saved["pages"]
+
+
+def save_page_cache():
+    if PAGE_CACHE_PAGES > 0 and not packed:
+        trim_page_cache()
+        badger_os.state_save("ebook_pages", {"index": index_file, "stamp": book_stamp, "pages": page_cache})
+
+
+# ------------------------------
+#        Page offset index
+# ------------------------------
+
+# Path of the index file for the current book, font and text size
+def index_path():
+    name = text_file.split("/")[-1]
+    if name.endswith(".txt"):
+        name = name[:-4]
+    return "{}/{}-{}-{}.idx".format(INDEX_DIR, name, state["font_idx"], int(state["text_size"] * 10 + 0.5))
+
+
+# Load the index for the current font and text size into RAM, creating it if it is missing or
+# was made for another version of the book or of the layout
+def load_index():
+    global index_file, index, index_count, index_last
+    index_file = index_path()
+    header = struct.pack(INDEX_HEADER, INDEX_MAGIC, INDEX_VERSION, book_stamp[1], book_stamp[2])
+    try:
+        with trace.open(index_file, "rb") as f:
+            if f.read(INDEX_HEADER_SIZE) == header:
+                index = bytearray(f.read())
+            else:
+                index = bytearray()
+    except OSError:
+        index = bytearray()
+    if len(index) < INDEX_ENTRY:
+        index = bytearray(struct.pack("<I", 0))  # The first page always starts at the top of the book
+        with open(index_file, "wb") as f:
+            f.write(header)
+            f.write(index)
+    index_count = len(index) // INDEX_ENTRY
+    index_last = page_offset(index_count - 1)
+
+
+# Has the whole book been paginated for the current font and text size?
+def index_complete():
+    return index_last >= book_size
+
+
+# Look up the start offset of a page
+def page_offset(page):
+    if packed:
+        return pack_rows(page)[0]
+    return struct.unpack_from("<I", index, page * INDEX_ENTRY)[0]
+
+
+# Find the page containing a given offset in the book
+def find_page(offset):
+    lo, hi = 0, index_count - 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if page_offset(mid) <= offset:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+# Lay out pages without drawing them and append their start offsets to the index.
+# Stops once the time budget is spent, the target page or offset is reached, or the book ends.
+def extend_index(budget_ms=None, page=None, offset=None):
+    global index_count, index_last
+    if packed or index_complete():
+        return
+    start = time.ticks_ms()
+    pos = reader.tell()
+    reader.seek(index_last)
+    with open(index_file, "ab") as f:
+        while not index_complete():
+            if page is not None and index_count > page:
+                break
+            if offset is not None and index_last > offset:
+                break
+            if budget_ms is not None and time.ticks_diff(time.ticks_ms(), start) >= budget_ms:
+                break
+            layout_page()
+            next_offset = reader.tell()
+            if next_offset <= index_last:
+                next_offset = book_size  # No progress, so treat the rest of the book as empty
+            entry = struct.pack("<I", next_offset)
+            f.write(entry)
+            index.extend(entry)
+            index_count += 1
+            index_last = next_offset
+    reader.seek(pos)
+
+
+# Does the given page exist? Paginates up to it if it has not been indexed yet
+def has_page(page):
+    extend_index(page=page)
+    if packed:
+        return page < index_count
+    return page < index_count and page_offset(page) < book_size
+
+
+# ------------------------------
+#         Packed books
+# ------------------------------
+
+# Path of the pre-paginated copy of the book
+def pack_path():
+    if text_file.endswith(".txt"):
+        return text_file[:-4] + PACK_EXTENSION
+    return text_file + PACK_EXTENSION
+
+
+# Find the page table for the current font and text size in the packed book.
+# The header holds the magic, a layout count, then for each layout its font index,
+# text size in tenths, page table offset and page count
+def load_pack():
+    global pack_table, index_count
+    try:
+        f = open(pack_path(), "rb")
+    except OSError:
+        return False
+    with f:
+        if f.read(4) != PACK_MAGIC:
+            return False
+        size = int(state["text_size"] * 10 + 0.5)
+        for _ in range(f.read(1)[0]):
+            font_idx, text_size, table, pages = struct.unpack("<BBII", f.read(10))
+            if font_idx == state["font_idx"] and text_size == size:
+                pack_table = table
+                index_count = pages
+                return True
+    return False
+
+
+# Read a page's rows from the packed book. Each page table entry points at the page's
+# rows, and the next entry marks where they end
+def pack_rows(page):
+    start, end = struct.unpack("<II", reader.read(pack_table + page * INDEX_ENTRY, INDEX_ENTRY * 2))
+    data = reader.read(start, end - start)
+    rows = []
+    for i in range(0, len(data), PACK_ROW):
+        offset, length = struct.unpack_from("<IH", data, i)
+        rows.append(offset)
+        rows.append(length)
+    return rows
+
+
+# Open the packed copy of the book if it has a layout for the current font and size, or the book itself
+def open_book():
+    global ebook, reader, packed, book_size, book_stamp
+    packed = load_pack()
+    book = pack_path() if packed else text_file
+    ebook = trace.open(book, "rb")
+    stat = os.stat(book)
+    book_size = stat[6]
+    # What the index and page cache were made from: the layout version and the book's size and mtime
+    book_stamp = [INDEX_VERSION, stat[6], stat[8]]
+    reader = WordReader(ebook, READ_BUFFER_SIZE)
+    if not packed:
+        load_index()
+
+
+# ------------------------------
+#           Library
+# ------------------------------
+
+# Make a book the open one and load its state, so only that book's details are read from flash
+def select_book(book):
+    global text_file, state, text_spacing
+    library["book"] = book
+    text_file = "{}/{}".format(BOOK_DIR, book)
+    state = {
+        "current_page": 0,
+        "font_idx": 0,
+        "text_size": 0.5
+    }
+    badger_os.state_load(book_state_name(book), state)
+    text_spacing = int(34 * state["text_size"])
+
+
+# Switch to the layout for a new font or text size and find the page holding the given offset
+def reflow(offset):
+    global page_cache
+    was_packed = packed
+    ebook.close()
+    open_book()
+    page_cache = {}
+    if packed != was_packed:
+        return 0  # Offsets in the book and its packed copy do not line up
+    extend_index(offset=offset)
+    return find_page(offset)
+
+
 # ------------------------------
 #       Main program loop
 # ------------------------------
@@ -180,13 +597,27 @@ def render_page():
 launch = True
 changed = False
 
-# Open the book file
-ebook = open(text_file, "r")
-if len(state["offsets"]) > state["current_page"]:
-    ebook.seek(state["offsets"][state["current_page"]])
+if len(books) == 0:
+    display.set_pen(15)
+    display.clear()
+    badger_os.warning(display, "To read books, add .txt files to the {} directory.".format(BOOK_DIR))
+    while True:
+        display.keepalive()
+        display.halt()
+
+try:
+    os.mkdir(INDEX_DIR)
+except OSError:
+    pass
+
+# Open the last book read, or its packed copy
+if library["book"] in books:
+    select_book(library["book"])
 else:
-    state["current_page"] = 0
-    state["offsets"] = []
+    select_book(books[0])
+    badger_os.state_save("ebook", library)
+open_book()
+load_page_cache()
 
 while True:
     # Sometimes a button press or hold will keep the system
@@ -195,54 +626,60 @@ while True:
 
     # Was the next page button pressed?
     if display.pressed(badger2040.BUTTON_DOWN):
-        state["current_page"] += 1
-
-        changed = True
+        if has_page(state["current_page"] + 1):
+            state["current_page"] += 1
+            changed = True
 
     # Was the previous page button pressed?
     if display.pressed(badger2040.BUTTON_UP):
         if state["current_page"] > 0:
             state["current_page"] -= 1
-            if state["current_page"] == 0:
-                ebook.seek(0)
-            else:
-                ebook.seek(state["offsets"][state["current_page"] - 1])  # Retrieve the start position of the last page
             changed = True
 
     if display.pressed(badger2040.BUTTON_A):
+        offset = page_offset(state["current_page"])  # Keep the same text on screen after the reflow
         state["text_size"] += 0.1
         if state["text_size"] > 0.8:
             state["text_size"] = 0.5
         text_spacing = int(34 * state["text_size"])
-        state["offsets"] = []
-        ebook.seek(0)
-        state["current_page"] = 0
+        state["current_page"] = reflow(offset)
         changed = True
 
     if display.pressed(badger2040.BUTTON_B):
+        offset = page_offset(state["current_page"])
         state["font_idx"] += 1
         if (state["font_idx"] >= len(FONTS)):
             state["font_idx"] = 0
-        state["offsets"] = []
-        ebook.seek(0)
-        state["current_page"] = 0
+        state["current_page"] = reflow(offset)
+        changed = True
+
+    # Move on to the next book in the library, picking up where it was left
+    if display.pressed(badger2040.BUTTON_C) and len(books) > 1:
+        ebook.close()
+        select_book(books[(books.index(library["book"]) + 1) % len(books)])
+        badger_os.state_save("ebook", library)
+        open_book()
+        load_page_cache()
+        if not has_page(state["current_page"]):
+            state["current_page"] = 0
         changed = True
 
     if launch and not changed:
-        if state["current_page"] > 0 and len(state["offsets"]) > state["current_page"] - 1:
-            ebook.seek(state["offsets"][state["current_page"] - 1])
+        if not has_page(state["current_page"]):
+            state["current_page"] = 0
         changed = True
         launch = False
 
     if changed:
         draw_frame()
         render_page()
-
-        # Is the next page one we've not displayed before?
-        if state["current_page"] >= len(state["offsets"]):
-            state["offsets"].append(ebook.tell())  # Add its start position to the state["offsets"] list
-        badger_os.state_save("ebook", state)
+        badger_os.state_save(book_state_name(library["book"]), state)
 
         changed = False
 
+        # Paginate ahead a little before halting, so later jumps need a single seek
+        extend_index(INDEX_BUDGET_MS)
+        cache_neighbours()
+        save_page_cache()
+
     display.halt()
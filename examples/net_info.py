@@ -1,6 +1,7 @@
 import badger2040
 from badger2040 import WIDTH
 import network
+import wifi
 
 TEXT_SIZE = 1
 LINE_HEIGHT = 16
@@ -10,8 +11,9 @@ display = badger2040.Badger2040()
 display.led(128)
 
 # Connects to the wireless network. Ensure you have entered your details in WIFI_CONFIG.py :).
-display.connect()
-net = network.WLAN(network.STA_IF).ifconfig()
+net = None
+if wifi.ensure_connected(status_handler=display.status_handler):
+    net = network.WLAN(network.STA_IF).ifconfig()
 
 # Page Header
 display.set_pen(15)
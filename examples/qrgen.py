@@ -3,20 +3,33 @@ import qrcode
 import time
 import os
 import badger_os
+import binascii
+import bitmap
+import catalogue
+import struct
+from filestamp import file_stamp
+
+QR_DIR = "/qrcodes"
+QR_INDEX = "/state/qrcodes.idx"
+
+# Encoded codes and their text lines are kept here, named by file and content CRC
+QR_CACHE_DIR = "/state/qrcodes"
+
+MAX_DOTS = 12  # With more codes than this, show the position as a number instead
 
 # Check that the qrcodes directory exists, if not, make it
 try:
-    os.mkdir("/qrcodes")
+    os.mkdir(QR_DIR)
 except OSError:
     pass
 
 # Check that there is a qrcode.txt, if not preload
 try:
-    text = open("/qrcodes/qrcode.txt", "r")
+    os.stat(QR_DIR + "/qrcode.txt")
 except OSError:
-    text = open("/qrcodes/qrcode.txt", "w")
-    if badger2040.is_wireless():
-        text.write("""https://pimoroni.com/badger2040w
+    with open(QR_DIR + "/qrcode.txt", "w") as text:
+        if badger2040.is_wireless():
+            text.write("""https://pimoroni.com/badger2040w
 Badger 2040 W
 * 296x128 1-bit e-ink
 * 2.4GHz wireless & RTC
@@ -27,8 +40,8 @@ Badger 2040 W
 Scan this code to learn
 more about Badger 2040 W.
 """)
-    else:
-        text.write("""https://pimoroni.com/badger2040
+        else:
+            text.write("""https://pimoroni.com/badger2040
 Badger 2040
 * 296x128 1-bit e-ink
 * five user buttons
@@ -38,66 +51,135 @@ Badger 2040
 Scan this code to learn
 more about Badger 2040.
 """)
-    text.flush()
-    text.seek(0)
-
-# Load all available QR Code Files
-try:
-    CODES = sorted([f for f in os.listdir("/qrcodes") if f.endswith(".txt")])
-    TOTAL_CODES = len(CODES)
-except OSError:
-    pass
 
+# The code files, sorted, with each one's title, size, mtime and the CRC of its cached contents.
+# The index is only rebuilt when the files in QR_DIR have changed
+codes = catalogue.Catalogue(QR_DIR, QR_INDEX, ".txt", 1)
+rebuilt = codes.refresh()
+TOTAL_CODES = len(codes)
 
-print(f'There are {TOTAL_CODES} QR Codes available:')
-for codename in CODES:
-    print(f'File: {codename}')
+print(f'There are {TOTAL_CODES} QR Codes available')
 
 display = badger2040.Badger2040()
 
 code = qrcode.QRCode()
 
+try:
+    os.mkdir(QR_CACHE_DIR)
+except OSError:
+    pass
+
 state = {
-    "current_qr": 0
+    "current_qr": 0,
+    "current_file": ""  # To find the code shown again when the index is rebuilt
 }
 
 
-def measure_qr_code(size, code):
+# Encode text as a QR code and read its dark modules as runs along each row, in the bitmap
+# format of lib/bitmap.py. Drawing it is then one rectangle per run rather than per module
+def encode(text):
+    code.set_text(text)
     w, h = code.get_size()
+    module = code.get_module
+    runs = bytearray((w, h))
+    for y in range(h):
+        start = -1
+        for x in range(w):
+            dark = module(x, y)
+            if dark and start < 0:
+                start = x
+            elif not dark and start >= 0:
+                runs.extend((y, start, x - start))
+                start = -1
+        if start >= 0:
+            runs.extend((y, start, w - start))
+    return bytes(runs)
+
+
+def cache_path(file, crc):
+    return "{}/{}-{:08x}.qr".format(QR_CACHE_DIR, file[:-4], crc)
+
+
+# A cached code is the matrix's length, the matrix, then the title and detail lines
+def load_cached(file, crc):
+    try:
+        with open(cache_path(file, crc), "rb") as f:
+            length = struct.unpack("<H", f.read(2))[0]
+            matrix = f.read(length)
+            lines = f.read().decode().split("\n")
+    except (OSError, ValueError):
+        return None
+    return matrix, lines[0], lines[1:]
+
+
+def save_cached(file, crc, matrix, title_text, detail_text):
+    with open(cache_path(file, crc), "wb") as f:
+        f.write(struct.pack("<H", len(matrix)))
+        f.write(matrix)
+        f.write("\n".join([title_text] + detail_text).encode())
+
+
+# A code's matrix, title and detail lines. The file is only read and encoded again when
+# its size or mtime differ from its catalogue entry, and then only if its contents have changed
+def load_qr_file(n):
+    entry = codes.entry(n)
+    state["current_file"] = entry.name
+    path = "{}/{}".format(QR_DIR, entry.name)
+    stamp = file_stamp(path)
+    if entry.crc and stamp == [entry.size, entry.mtime]:
+        cached = load_cached(entry.name, entry.crc)
+        if cached is not None:
+            return cached
+
+    with open(path, "r") as f:
+        data = f.read()
+    crc = binascii.crc32(data)
+    cached = load_cached(entry.name, crc)
+    if cached is None:
+        lines = data.strip().split("\n")
+        code_text = lines.pop(0)
+        title_text = lines.pop(0)
+        cached = encode(code_text), title_text, lines
+        save_cached(entry.name, crc, *cached)
+    if entry.crc and entry.crc != crc:
+        try:
+            os.remove(cache_path(entry.name, entry.crc))
+        except OSError:
+            pass
+    if stamp is not None:
+        entry.size, entry.mtime = stamp
+    entry.title = cached[1]
+    entry.crc = crc
+    codes.update(entry)
+    return cached
+
+
+def measure_qr_code(size, matrix):
+    w, h = bitmap.size(matrix)
     module_size = int(size / w)
     return module_size * w, module_size
 
 
-def draw_qr_code(ox, oy, size, code):
-    size, module_size = measure_qr_code(size, code)
+def draw_qr_code(ox, oy, size, matrix):
+    size, module_size = measure_qr_code(size, matrix)
     display.set_pen(15)
     display.rectangle(ox, oy, size, size)
     display.set_pen(0)
-    for x in range(size):
-        for y in range(size):
-            if code.get_module(x, y):
-                display.rectangle(ox + x * module_size, oy + y * module_size, module_size, module_size)
+    bitmap.blit_scaled(display, matrix, ox, oy, module_size)
 
 
 def draw_qr_file(n):
     display.led(128)
-    file = CODES[n]
-    codetext = open("/qrcodes/{}".format(file), "r")
-
-    lines = codetext.read().strip().split("\n")
-    code_text = lines.pop(0)
-    title_text = lines.pop(0)
-    detail_text = lines
+    matrix, title_text, detail_text = load_qr_file(n)
 
     # Clear the Display
     display.set_pen(15)  # Change this to 0 if a white background is used
     display.clear()
     display.set_pen(0)
 
-    code.set_text(code_text)
-    size, _ = measure_qr_code(128, code)
+    size, _ = measure_qr_code(128, matrix)
     left = top = int((badger2040.HEIGHT / 2) - (size / 2))
-    draw_qr_code(left, top, 128, code)
+    draw_qr_code(left, top, 128, matrix)
 
     left = 128 + 5
 
@@ -108,7 +190,10 @@ def draw_qr_file(n):
         display.text(line, left, top, badger2040.WIDTH, 1)
         top += 10
 
-    if TOTAL_CODES > 1:
+    if TOTAL_CODES > MAX_DOTS:
+        position = "{}/{}".format(n + 1, TOTAL_CODES)
+        display.text(position, badger2040.WIDTH - display.measure_text(position, 1) - 2, badger2040.HEIGHT - 10, badger2040.WIDTH, 1)
+    elif TOTAL_CODES > 1:
         for i in range(TOTAL_CODES):
             x = 286
             y = int((128 / 2) - (TOTAL_CODES * 10 / 2) + (i * 10))
@@ -122,6 +207,12 @@ def draw_qr_file(n):
 
 badger_os.state_load("qrcodes", state)
 
+# Files added or removed move the codes after them, so look the one shown up by name
+if rebuilt and state["current_file"]:
+    found = codes.find(state["current_file"])
+    if found is not None:
+        state["current_qr"] = found
+
 # When we removed some files code may try to display not existing entry
 if state["current_qr"] > TOTAL_CODES - 1:
     state["current_qr"] = 0
@@ -2,48 +2,238 @@
 # This example grabs current weather details from Open Meteo and displays them on Badger 2040 W.
 # Find out more about the Open Meteo API at https://open-meteo.com
 import badger2040
-from badger2040 import WIDTH
-import urequests
+from badger2040 import WIDTH, HEIGHT
 import jpegdec
 import machine
-from machine import Pin
 import random
 import time
-
-# Set your latitude/longitude here (find yours by right clicking in Google Maps!)
-LAT = 23
-LNG = 15
+import badger_os
+import battery
+import binascii
+import bitmap
+import fetch
+import os
+import partial
+import trace
+import wifi
+from filestamp import file_stamp
+
+# How often to wake and refresh, in minutes. In between the badge is powered off on battery
+REFRESH_MINUTES = 20
+USB_POLL_S = 1  # How often buttons are checked while waiting on USB power
+
+# Set your locations here, as (name, latitude, longitude) (find yours by right clicking in Google Maps!)
+# Page through them with the up and down buttons. All of them are fetched together, in one
+# request to each API, so paging is drawn from the cache without any network use
+LOCATIONS = (
+    ("Bydgoszcz", 23, 15),
+)
 TIMEZONE = "auto"  # determines time zone from lat/long
 
 
-URL = "https://api.open-meteo.com/v1/forecast?latitude=" + str(LAT) + "&longitude=" + str(LNG) + "&current_weather=true&daily=weathercode,apparent_temperature_max,apparent_temperature_min,sunrise,sunset,precipitation_sum,precipitation_probability_max,winddirection_10m_dominant&timezone=" + TIMEZONE
-URL2 = "https://air-quality-api.open-meteo.com/v1/air-quality?latitude=" + str(LAT) + "&longitude=" + str(LNG) + "&hourly=pm10,pm2_5,uv_index,alder_pollen,birch_pollen,grass_pollen,mugwort_pollen,olive_pollen,ragweed_pollen"
+# Only as many days and hours are asked for as the page shows: today to the day after tomorrow,
+# and today's air quality
+FORECAST_DAYS = 4
+AIR_QUALITY_DAYS = 1
+
+# Point these at tools/weather_stub.py to try the app against canned responses
+FORECAST_API = "https://api.open-meteo.com/v1/forecast"
+AIR_QUALITY_API = "https://air-quality-api.open-meteo.com/v1/air-quality"
+
+# Both requests are made at once. If one takes longer than this (in seconds) the page is drawn without it
+FORECAST_TIMEOUT = 15
+AIR_QUALITY_TIMEOUT = 15
+# Time allowed for joining the network, after which the page is drawn from the cache
+WIFI_TIMEOUT = 10
+
+COORDINATES = "?latitude=" + ",".join(str(lat) for _, lat, _ in LOCATIONS) + "&longitude=" + ",".join(str(lng) for _, _, lng in LOCATIONS)
+URL2 = AIR_QUALITY_API + COORDINATES + "&hourly=pm10,pm2_5,uv_index,alder_pollen,birch_pollen,grass_pollen,mugwort_pollen,olive_pollen,ragweed_pollen&forecast_days=" + str(AIR_QUALITY_DAYS)
+
+# The parts of each response that are used. The rest is skipped as it is read, never parsed
+DAILY = ("weathercode", "apparent_temperature_max", "apparent_temperature_min", "sunrise", "sunset",
+         "precipitation_sum", "precipitation_probability_max", "winddirection_10m_dominant")
+CURRENT_FIELDS = (("current_weather",),)
+DAILY_FIELDS = tuple(("daily", name) for name in DAILY)
+POLLUTANTS = ("pm10", "pm2_5", "alder_pollen", "birch_pollen", "grass_pollen", "mugwort_pollen",
+              "olive_pollen", "ragweed_pollen")
+AIR_QUALITY_FIELDS = (("hourly", "uv_index"),) + tuple(("hourly", name, 1) for name in POLLUTANTS)
+
+# The last of each dataset fetched for each location is kept in /state/weather_cache.json, and
+# only fetched again once it is older than this many seconds. Until then the page is drawn from the cache
+CACHE_TTL = {
+    "current": REFRESH_MINUTES * 60,
+    "daily": 6 * 60 * 60,
+    "air_quality": 60 * 60
+}
+# The RTC alarm goes off on the minute, so a wake can come up to a minute before a dataset's TTL
+# is up. A dataset this close to its TTL counts as stale, so that wake still fetches it
+TTL_MARGIN_S = 90
+cache = {}
+badger_os.state_load("weather_cache", cache)
+for name in list(cache):
+    if name not in [location[0] for location in LOCATIONS]:
+        del cache[name]
+for name, _, _ in LOCATIONS:
+    if name not in cache:
+        cache[name] = {"current": None, "daily": None, "air_quality": None}
+
+# The page last sent to the display, as the framebuffer's bytes
+FRAME_FILE = "/state/weather_frame.bin"
+
+# A changed page is compared with the last one in these tiles, and the box around the tiles that
+# differ is refreshed with one partial update. When that box covers half the display or more, as
+# when the theme changes, the whole display is refreshed instead (see lib/partial.py).
+# Partial updates work in 8 pixel rows, so the rows are multiples of 8. The columns follow the page's text
+TILE_COLUMNS = (0, 100, 170, 230, WIDTH)
+TILE_ROWS = (0, 32, 64, 96, HEIGHT)
+
+# A hash of what draw_page() last put on the display, and the location shown
+state = {
+    "drawn": None,
+    "location": 0
+}
+badger_os.state_load("weather", state)
 
 # Define foreground and background variable for color mode
 fg = 15  # Start with normal colors
 bg = 0
 
 # Display Setup
-display = badger2040.Badger2040()
+display = trace.display(badger2040.Badger2040(), "weather")
 
 display.led(128)
 display.set_update_speed(2)
 
-jpeg = jpegdec.JPEG(display.display)
-
-# detect exist USB power
-usb_detect = Pin('WL_GPIO2', Pin.IN)
-
-def get_data():
+jpeg = trace.decoder(jpegdec.JPEG(display.display))
+
+# Weather codes from https://open-meteo.com/en/docs, grouped by the icon shown for them
+ICON_CODES = {
+    "snow": (71, 73, 75, 77, 85, 86),
+    "rain": (51, 53, 55, 56, 57, 61, 63, 65, 66, 67, 80, 81, 82),
+    "cloud": (1, 2, 3, 45, 48),
+    "sun": (0,),
+    "storm": (95, 96, 99)
+}
+WEATHER_ICONS = {}
+for icon, codes in ICON_CODES.items():
+    for code in codes:
+        WEATHER_ICONS[code] = icon
+
+# Weather icons from https://fontawesome.com/. Each is decoded once per theme and scale and
+# kept here as a 1-bit bitmap, so drawing a page needs no JPEG decodes. Each bitmap is stamped,
+# in /state/weather_icons.json, with its JPEG's size and mtime and ICON_CACHE_VERSION, and
+# decoded again when that changes. Bump ICON_CACHE_VERSION when the way icons are drawn changes
+ICON_CACHE_DIR = "/state/weather_icons"
+ICON_CACHE_VERSION = 2
+# The decode flag for each size, and what the JPEG's width and height are divided by
+ICON_SCALES = {
+    "full": (jpegdec.JPEG_SCALE_FULL, 1),
+    "half": (jpegdec.JPEG_SCALE_HALF, 2)
+}
+icon_stamps = {}
+badger_os.state_load("weather_icons", icon_stamps)
+
+try:
+    os.mkdir(ICON_CACHE_DIR)
+except OSError:
+    pass
+
+
+# The forecast request for whichever of the current conditions and the daily forecast are wanted
+def forecast_url(current, daily):
+    url = FORECAST_API + COORDINATES + "&timezone=" + TIMEZONE
+    if current:
+        url += "&current_weather=true"
+    if daily:
+        url += "&daily=" + ",".join(DAILY) + "&forecast_days=" + str(FORECAST_DAYS)
+    return url
+
+
+# With more than one location the APIs answer with a list, one entry per location
+def location_fields(fields):
+    if len(LOCATIONS) == 1:
+        return fields
+    return tuple((i,) + path for i in range(len(LOCATIONS)) for path in fields)
+
+
+# The values for one location, with the fields' paths as they are asked for
+def location_values(j, i):
+    if len(LOCATIONS) == 1:
+        return j
+    return {path[1:]: value for path, value in j.items() if path[0] == i}
+
+
+# A dataset is fetched for every location at once, so it is out of date if it is for any of them
+def stale(dataset):
+    now = time.time()
+    for name, _, _ in LOCATIONS:
+        entry = cache[name][dataset]
+        if entry is None:
+            return True
+        age = now - entry["fetched"]
+        if age < 0 or age >= CACHE_TTL[dataset] - TTL_MARGIN_S:
+            return True
+    return False
+
+
+# A dataset for the location shown
+def cached(dataset):
+    entry = cache[LOCATIONS[state["location"]][0]][dataset]
+    return entry["data"] if entry is not None else None
+
+
+# Fetch the datasets that are out of date, both requests at once, and cache what arrives
+def refresh_cache():
+    current, daily, air_quality = stale("current"), stale("daily"), stale("air_quality")
+    requests = []
+    if current or daily:
+        url = forecast_url(current, daily)
+        print(f"Requesting URL: {url}")
+        fields = (CURRENT_FIELDS if current else ()) + (DAILY_FIELDS if daily else ())
+        requests.append((url, location_fields(fields), FORECAST_TIMEOUT))
+    if air_quality:
+        print(f"Requesting URL: {URL2}")
+        requests.append((URL2, location_fields(AIR_QUALITY_FIELDS), AIR_QUALITY_TIMEOUT))
+    if not requests:
+        return
+
+    # Connects to the wireless network. Ensure you have entered your details in WIFI_CONFIG.py :).
+    # The connection status is only shown while there is no page on the display
+    if not wifi.ensure_connected(WIFI_TIMEOUT, display.status_handler if state["drawn"] is None else None):
+        return
+    results = fetch.get_json_all(requests)
+
+    now = time.time()
+    j = results.pop(0) if current or daily else None
+    j2 = results.pop(0) if air_quality else None
+    if j is not None:
+        print("Data obtained!")
+    if j2 is not None:
+        print("Airquality Data obtained!")
+    for i, (name, _, _) in enumerate(LOCATIONS):
+        fetched = {}
+        if j is not None:
+            values = location_values(j, i)
+            if current and ("current_weather",) in values:
+                fetched["current"] = values[("current_weather",)]
+            if daily and all(path in values for path in DAILY_FIELDS):
+                fetched["daily"] = {field: values[("daily", field)] for field in DAILY}
+        if j2 is not None:
+            fetched["air_quality"] = air_quality_data(location_values(j2, i))
+        for dataset, data in fetched.items():
+            cache[name][dataset] = {"fetched": now, "data": data}
+    if j is not None or j2 is not None:
+        badger_os.state_save("weather_cache", cache)
+
+
+def get_data(current, daily):
     global weathercode, temperature, windspeed, winddirection, date, current_time_str, day_weathercode
     global apparent_temperature_max, apparent_temperature_min, sunrise, sunset
     global precipitation_sum, precipitation_probability_max, winddirection_10m_dominant
     global now_minutes
-    print(f"Requesting URL: {URL}")
-    r = urequests.get(URL)
-    j = r.json()
-    print("Data obtained!")
-    current = j["current_weather"]
+    if current is None or daily is None:
+        temperature = None
+        return
     temperature = current["temperature"]
     windspeed = current["windspeed"]
     winddirection = calculate_bearing(current["winddirection"])
@@ -52,7 +242,6 @@ def get_data():
     date, current_time_str = current["time"].split("T")
     hour, minute = map(int, current_time_str.split(":")[:2])
     now_minutes = hour * 60 + minute   # minutes since midnight
-    daily = j["daily"]
     day_weathercode = daily["weathercode"]
     apparent_temperature_max = daily["apparent_temperature_max"]
     apparent_temperature_min = daily["apparent_temperature_min"]
@@ -63,42 +252,36 @@ def get_data():
     precipitation_probability_max = daily["precipitation_probability_max"]
     winddirection_10m_dominant = daily["winddirection_10m_dominant"]
     winddirection_10m_dominant = calculate_bearing(winddirection_10m_dominant[0])
-    r.close()
-
-def get_data_airquality():
-    global pm10, pm2_5, alder_pollen, uv_index, birch_pollen, grass_pollen, mugwort_pollen, olive_pollen, ragweed_pollen
-
-    print(f"Requesting URL: {URL2}")
-    r2 = urequests.get(URL2)
 
-    # open the json data
-    j2 = r2.json()
-    print("Airquality Data obtained!")
-    print(j2)
+# The air-quality readings shown: each pollutant's at hour [1] and the day's highest UV index
+def air_quality_data(j2):
+    # If a key doesn't exist, it'll default to NA
+    data = {name: j2.get(("hourly", name, 1), "NA") for name in POLLUTANTS}
 
-    # parse relevant data from json
-    airquality = j2["hourly"]
-    print("Air quality:", airquality)
+    # Ensure uv_index list has no None values before applying max
+    uv_values = [val for val in j2.get(("hourly", "uv_index"), []) if val is not None]
+    data["uv_index"] = max(uv_values) if uv_values else 'NA'
+    return data
 
-    # If a key doesn't exist, it'll default to a list with a single None item
-    pm10 = airquality.get("pm10", [None])[1]
-    pm2_5 = airquality.get("pm2_5", [None])[1]
 
-    # Ensure uv_index list has no None values before applying max
-    uv_values = [val for val in airquality.get("uv_index", []) if val is not None]
-    uv_index = max(uv_values) if uv_values else 'NA'
+def get_data_airquality(data):
+    global pm10, pm2_5, alder_pollen, uv_index, birch_pollen, grass_pollen, mugwort_pollen, olive_pollen, ragweed_pollen
 
-    alder_pollen = airquality.get("alder_pollen", [None])[1]
-    birch_pollen = airquality.get("birch_pollen", [None])[1]
-    grass_pollen = airquality.get("grass_pollen", [None])[1]
-    mugwort_pollen = airquality.get("mugwort_pollen", [None])[1]
-    olive_pollen = airquality.get("olive_pollen", [None])[1]
-    ragweed_pollen = airquality.get("ragweed_pollen", [None])[1]
+    # Without any air-quality data everything reads NA
+    if data is None:
+        data = {}
+    pm10 = data.get("pm10", "NA")
+    pm2_5 = data.get("pm2_5", "NA")
+    uv_index = data.get("uv_index", "NA")
+    alder_pollen = data.get("alder_pollen", "NA")
+    birch_pollen = data.get("birch_pollen", "NA")
+    grass_pollen = data.get("grass_pollen", "NA")
+    mugwort_pollen = data.get("mugwort_pollen", "NA")
+    olive_pollen = data.get("olive_pollen", "NA")
+    ragweed_pollen = data.get("ragweed_pollen", "NA")
 
     print(f"{uv_index} UVIndex ")
 
-    r2.close()
-
 def is_night():
     global now_minutes, sunrise, sunset
 
@@ -118,17 +301,85 @@ def calculate_bearing(d):
     return dirs[ix % len(dirs)]
 
 
+# Decode an icon into the display and capture it as a bitmap for next time
+def decode_icon(file, path, x, y, scale, background_color):
+    try:
+        jpeg.open_file(file)
+        flag, divisor = ICON_SCALES[scale]
+        w = jpeg.get_width() // divisor
+        h = jpeg.get_height() // divisor
+        display.set_pen(background_color)
+        display.rectangle(x, y, w, h)
+        background = bitmap.sample(display, x, y)
+        jpeg.decode(x, y, flag)
+    except Exception as e:
+        print("Error opening or decoding JPEG:", e)
+        return False
+    bitmap.save(path, bitmap.capture(display, x, y, w, h, background))
+    return True
+
+
+# Draw an icon, by name, the way its JPEG decodes: the whole square is painted, not just the ink
+def draw_icon(icon, x, y, scale, text_color, background_color):
+    if icon is None:
+        return
+    # White text (15) uses the dark icons and black text (0) the light ones
+    theme = "_dark" if text_color == 15 else ""
+    file = f"/icons/icon-{icon}{theme}.jpg"
+    name = f"{icon}{theme}-{scale}"
+    path = f"{ICON_CACHE_DIR}/{name}.bin"
+    stamp = file_stamp(file)
+    if stamp is not None:
+        stamp.append(ICON_CACHE_VERSION)
+    image = bitmap.load(path) if stamp is not None and icon_stamps.get(name) == stamp else None
+    if image is None:
+        if decode_icon(file, path, x, y, scale, background_color):
+            icon_stamps[name] = stamp
+            badger_os.state_save("weather_icons", icon_stamps)
+        return
+    w, h = bitmap.size(image)
+    display.set_pen(background_color)
+    display.rectangle(x, y, w, h)
+    display.set_pen(text_color)
+    bitmap.blit(display, image, x, y)
+
+
+# The tiles, as (x, y, w, h), that differ between two frames
+def changed_areas(last, frame):
+    areas = []
+    for top, bottom in zip(TILE_ROWS, TILE_ROWS[1:]):
+        start = top >> 3
+        end = bottom >> 3
+        for left, right in zip(TILE_COLUMNS, TILE_COLUMNS[1:]):
+            for x in range(left, right):
+                i = x * bitmap.COLUMN_BYTES
+                if last[i + start:i + end] != frame[i + start:i + end]:
+                    areas.append((left, top, right - left, bottom - top))
+                    break
+    return areas
+
+
+# Send the page in the framebuffer to the display. When the display still shows the last page
+# sent, only what differs from it is refreshed
+def refresh_display():
+    frame = bytes(display.display)
+    last = None
+    if state["drawn"] is not None:
+        try:
+            with open(FRAME_FILE, "rb") as f:
+                last = f.read()
+        except OSError:
+            pass
+    if last is not None and len(last) == len(frame):
+        partial.update(display, changed_areas(last, frame))
+    else:
+        display.update()
+    with open(FRAME_FILE, "wb") as f:
+        f.write(frame)
+
+
 def draw_page(text_color, background_color):
     
-    # Define the icon file names based on the text color for simplicity
-    # Assuming white text (15) uses dark icons and black text (0) uses light icons
-    icon_prefix = "_dark" if text_color == 15 else ""
-    icon_snow = f"/icons/icon-snow{icon_prefix}.jpg"
-    icon_rain = f"/icons/icon-rain{icon_prefix}.jpg"
-    icon_cloud = f"/icons/icon-cloud{icon_prefix}.jpg"
-    icon_sun = f"/icons/icon-sun{icon_prefix}.jpg"
-    icon_storm = f"/icons/icon-storm{icon_prefix}.jpg"
-    
     # Clear the display with the background color
     display.set_pen(background_color)
     display.clear()
@@ -137,30 +388,14 @@ def draw_page(text_color, background_color):
     display.set_pen(text_color)
     display.rectangle(0, 0, WIDTH, 10)
     display.set_pen(background_color)
-    display.text("Weather in Bydgoszcz @ p00fOS", 10, 1, WIDTH, 0.6) # parameters are left padding, top padding, width of screen area, font size
+    display.text(f"Weather in {LOCATIONS[state['location']][0]} @ p00fOS", 10, 1, WIDTH, 0.6) # parameters are left padding, top padding, width of screen area, font size
     display.set_pen(text_color)
 
     display.set_font("bitmap8")
 
     if temperature is not None:
         # Choose an appropriate icon based on the weather code
-        # Weather codes from https://open-meteo.com/en/docs
-        # Weather icons from https://fontawesome.com/
-        if weathercode in [71, 73, 75, 77, 85, 86]:  # codes for snow
-            jpeg.open_file(icon_snow)
-        elif weathercode in [51, 53, 55, 56, 57, 61, 63, 65, 66, 67, 80, 81, 82]:  # codes for rain
-            jpeg.open_file(icon_rain)
-        elif weathercode in [1, 2, 3, 45, 48]:  # codes for cloud
-            jpeg.open_file(icon_cloud)
-        elif weathercode in [0]:  # codes for sun
-            jpeg.open_file(icon_sun)
-        elif weathercode in [95, 96, 99]:  # codes for storm
-            jpeg.open_file(icon_storm)
-            
-        try:
-            jpeg.decode(10,30, jpegdec.JPEG_SCALE_FULL)
-        except Exception as e:
-            print("Error opening or decoding JPEG:", e)
+        draw_icon(WEATHER_ICONS.get(weathercode), 10, 30, "full", text_color, background_color)
 
         # show current temperature, with highs and lows
         display.set_pen(text_color)
@@ -168,8 +403,7 @@ def draw_page(text_color, background_color):
         display.text(f"{apparent_temperature_min[1]}°C, {apparent_temperature_max[1]}°C", 20, 115, WIDTH - 50, 1)
 
         # show prob and amount of rain today
-        jpeg.open_file(icon_rain)
-        jpeg.decode(100,20, jpegdec.JPEG_SCALE_HALF)
+        draw_icon("rain", 100, 20, "half", text_color, background_color)
         display.set_pen(text_color)
         display.text(f"{precipitation_probability_max[1]}% ", 135, 25, WIDTH - 105, 2)
         display.text(f"{precipitation_sum[1]} mm ", 135, 45, WIDTH - 105, 1)
@@ -187,35 +421,15 @@ def draw_page(text_color, background_color):
 # Show tomorrow's weather
         print("Daily weathercodes")
         print(day_weathercode)
-        if day_weathercode[2] in [71, 73, 75, 77, 85, 86]:  # codes for snow
-            jpeg.open_file(icon_snow)
-        elif day_weathercode[2] in [51, 53, 55, 56, 57, 61, 63, 65, 66, 67, 80, 81, 82]:  # codes for rain
-            jpeg.open_file(icon_rain)
-        elif day_weathercode[2] in [1, 2, 3, 45, 48]:  # codes for cloud
-            jpeg.open_file(icon_cloud)
-        elif day_weathercode[2] in [0]:  # codes for sun
-            jpeg.open_file(icon_sun)
-        elif day_weathercode[2] in [95, 96, 99]:  # codes for storm
-            jpeg.open_file(icon_storm)
         display.set_pen(text_color)
         display.text("+1 Day", 160, 110, WIDTH - 105, 1.5)
-        jpeg.decode(190,90, jpegdec.JPEG_SCALE_HALF)
+        draw_icon(WEATHER_ICONS.get(day_weathercode[2]), 190, 90, "half", text_color, background_color)
 
 # Show day after tomorrow's weather
 
-        if day_weathercode[3] in [71, 73, 75, 77, 85, 86]:  # codes for snow
-            jpeg.open_file(icon_snow)
-        elif day_weathercode[3] in [51, 53, 55, 56, 57, 61, 63, 65, 66, 67, 80, 81, 82]:  # codes for rain
-            jpeg.open_file(icon_rain)
-        elif day_weathercode[3] in [1, 2, 3, 45, 48]:  # codes for cloud
-            jpeg.open_file(icon_cloud)
-        elif day_weathercode[3] in [0]:  # codes for sun
-            jpeg.open_file(icon_sun)
-        elif day_weathercode[3] in [95, 96, 99]:  # codes for storm
-            jpeg.open_file(icon_storm)
         display.set_pen(text_color)
         display.text("+2 Day", 230, 110, WIDTH - 105, 1.5)
-        jpeg.decode(260,90, jpegdec.JPEG_SCALE_HALF)
+        draw_icon(WEATHER_ICONS.get(day_weathercode[3]), 260, 90, "half", text_color, background_color)
 
 #        display.text(f"Wind Direction: {winddirection}", int(WIDTH / 3), 68, WIDTH - 105, 2)
         display.set_pen(text_color)
@@ -240,27 +454,95 @@ def draw_page(text_color, background_color):
         display.set_pen(background_color)
         display.text("Unable to display weather! Check your network settings in WIFI_CONFIG.py", 5, 65, WIDTH, 1)
 
-    display.update()
+    refresh_display()
+
+
+# Everything draw_page() shows, so a page can be compared with the one on the display
+def page_content(text_color):
+    name = LOCATIONS[state["location"]][0]
+    if temperature is None:
+        return (text_color, name, None)
+    return (text_color, name, weathercode, temperature, apparent_temperature_min[1], apparent_temperature_max[1],
+            precipitation_probability_max[1], precipitation_sum[1], windspeed, winddirection,
+            winddirection_10m_dominant, sunrise, sunset, day_weathercode[2], day_weathercode[3],
+            current_time_str, date, uv_index, pm10, pm2_5, alder_pollen, birch_pollen, grass_pollen,
+            mugwort_pollen, ragweed_pollen)
 
-# Connects to the wireless network. Ensure you have entered your details in WIFI_CONFIG.py :).
-print("connecting")
-display.connect()
 
-while True:
-    get_data()
-    get_data_airquality()
+def draw_cached():
+    get_data(cached("current"), cached("daily"))
+    get_data_airquality(cached("air_quality"))
 
 # Switch to dark background with light text after sunset, 
 # or light background with dark text during the day
-    if is_night():
-        draw_page(15, 0)   # light text on dark background
+    if temperature is not None and is_night():
+        text_color, background_color = 15, 0   # light text on dark background
     else:
-        draw_page(0, 15)   # dark text on light background
-
-# If running on USB power, refresh every 20 minutes (1200s).
-# If running on battery, put the display into deep sleep until next wake-up by any button.
-    if usb_detect.value() == 1:
-        time.sleep(1200)
-    else:
-        display.halt()
-
+        text_color, background_color = 0, 15   # dark text on light background
+
+    # Leave the display alone if it already shows this page
+    drawn = binascii.crc32(repr(page_content(text_color)).encode())
+    if drawn == state["drawn"]:
+        print("Page unchanged")
+        return
+    draw_page(text_color, background_color)
+    state["drawn"] = drawn
+    badger_os.state_save("weather", state)
+
+
+# Up and down page through the locations. Returns True if either was pressed
+def page():
+    paged = False
+    if display.pressed(badger2040.BUTTON_UP):
+        state["location"] -= 1
+        paged = True
+    if display.pressed(badger2040.BUTTON_DOWN):
+        state["location"] += 1
+        paged = True
+    state["location"] %= len(LOCATIONS)
+    return paged
+
+
+# Show what is cached straight away, before connecting, then again if fresher data changes the page.
+# Paging only shows what is cached, unless there is nothing cached for the location yet
+def show(paged):
+    complete = all(cached(dataset) is not None for dataset in CACHE_TTL)
+    if complete:
+        draw_cached()
+    if not (paged and complete):
+        refresh_cache()
+        draw_cached()
+
+
+# Only when the RTC woke the badge is the page from last time still on the display.
+# Otherwise the launcher may have drawn over it
+if not badger2040.woken_by_rtc():
+    state["drawn"] = None
+
+show(page())
+
+# Wake again in REFRESH_MINUTES. On battery the RTC alarm powers the badge back on, and any
+# button wakes it sooner. On USB power it can't turn off, so it waits here instead, still
+# paging through the locations, and then resets
+if battery.usb_powered():
+    button_up = badger2040.BUTTONS[badger2040.BUTTON_UP]
+    button_down = badger2040.BUTTONS[badger2040.BUTTON_DOWN]
+    steps = []  # Pages pressed for since the loop last looked
+
+    def button(pin):
+        steps.append(-1 if pin == button_up else 1)
+
+    button_up.irq(trigger=machine.Pin.IRQ_RISING, handler=button)
+    button_down.irq(trigger=machine.Pin.IRQ_RISING, handler=button)
+
+    deadline = time.ticks_add(time.ticks_ms(), REFRESH_MINUTES * 60 * 1000)
+    while time.ticks_diff(deadline, time.ticks_ms()) > 0:
+        if steps:
+            while steps:
+                state["location"] += steps.pop(0)
+            state["location"] %= len(LOCATIONS)
+            show(True)
+        time.sleep(USB_POLL_S)
+    machine.reset()
+
+badger2040.sleep_for(REFRESH_MINUTES)
@@ -2,10 +2,13 @@ import binascii
 import badger2040
 import badger_os
 import machine
+import wifi
 
 # *** List Title ***
 list_title = "Wi-Fi Network Selection"
 list_file = "wifi_networks.txt"
+# First entry of the list: connect to the strongest known network in range, now and from then on
+auto_item = "Auto (strongest known)||"
 
 # Global Constants
 WIDTH = badger2040.WIDTH
@@ -46,6 +49,9 @@ if save_list:
         for item in list_items:
             f.write(item + "\n")
 
+known_networks = [tuple(item.split("|")) for item in list_items]
+list_items.insert(0, auto_item)
+
 # ------------------------------
 #      Drawing functions
 # ------------------------------
@@ -101,6 +107,27 @@ def update_wifi_config(selected_item):
         f.write(f'PSK = "{psk}"\n')
         f.write(f'COUNTRY = "{country}"\n')
 
+def show_message(text):
+    display.set_pen(15)
+    display.clear()
+    display.set_pen(0)
+    display.text(text, 30, HEIGHT // 2, WIDTH, 1.0)
+    display.update()
+
+# Join the best known network in range and save it to WIFI_CONFIG.py. Other apps keep choosing
+# the best network for themselves until a network is picked by hand
+def auto_connect():
+    wifi.set_auto(True)
+    show_message("Searching...")
+    ssid = wifi.connect_best(known_networks)
+    if ssid is None:
+        show_message("None in range")
+        return
+    for network in known_networks:
+        if network[0] == ssid:
+            update_wifi_config("|".join(network))
+    show_message(ssid)
+
 # ------------------------------
 #        Program setup
 # ------------------------------
@@ -160,13 +187,12 @@ while True:
                     display.update_speed(badger2040.UPDATE_FAST)
                 changed = True
         if display.pressed(badger2040.BUTTON_B):
-            selected_item = list_items[state["current_item"]]
-            update_wifi_config(selected_item)
-            display.set_pen(15)
-            display.clear()
-            display.set_pen(0)
-            display.text("Saved!", 30, HEIGHT // 2, WIDTH, 1.0)
-            display.update()
+            if state["current_item"] == 0:
+                auto_connect()
+            else:
+                wifi.set_auto(False)
+                update_wifi_config("|".join(known_networks[state["current_item"] - 1]))
+                show_message("Saved!")
             # display.halt(2000)
         if display.pressed(badger2040.BUTTON_C):
             if state["current_item"] < len(list_items) - 1:
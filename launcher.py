@@ -1,5 +1,6 @@
 import gc
 import os
+import binascii
 import time
 import math
 import badger2040
@@ -7,11 +8,18 @@ import badger_os
 import pngdec
 import jpegdec
 import network
-from machine import ADC, Pin
+import bitmap
+import battery
+from filestamp import file_stamp
+import partial
 
 APP_DIR = "/examples"
 FONT_SIZE = 2
 
+# Decoded icons are kept here as 1-bit bitmaps, so paging through apps skips the decoders
+ICON_CACHE_DIR = "/state/icons"
+ICON_SIZE = 52
+
 changed = False
 exited_to_launcher = False
 woken_by_button = badger2040.woken_by_button()  # Must be done before we clear_pressed_to_wake
@@ -34,27 +42,92 @@ jpeg = jpegdec.JPEG(display.display)
 
 state = {
     "page": 0,
-    "running": "launcher"
+    "running": "launcher",
+    "screen": []
 }
 
 badger_os.state_load("launcher", state)
 
-examples = [x[:-3] for x in os.listdir("/examples") if x.endswith(".py")]
+# For each app: its icon file's size and mtime, and the label's width
+icon_cache = {}
+badger_os.state_load("launcher_icons", icon_cache)
+icon_cache_changed = False
+
+try:
+    os.mkdir(ICON_CACHE_DIR)
+except OSError:
+    pass
+
+# The apps, with their module, icon and label, as found on the last scan of APP_DIR
+manifest = {
+    "signature": 0,
+    "apps": []
+}
+badger_os.state_load("launcher_apps", manifest)
+
+
+# Build the app list from a single pass over the app directory. Icons are matched against the
+# same listing, so finding them needs no file opens. The manifest is only rewritten if the
+# names or sizes of the files have changed
+def scan_apps():
+    files = {}
+    for entry in os.ilistdir(APP_DIR):
+        files[entry[0]] = entry[3] if len(entry) > 3 else 0
+    names = sorted(files)
+    signature = binascii.crc32("\n".join([f"{name}:{files[name]}" for name in names]).encode())
+    if signature == manifest["signature"] and len(manifest["apps"]) > 0:
+        return
+
+    apps = []
+    for name in names:
+        if not name.endswith(".py"):
+            continue
+        app = name[:-3]
+        icon = "icon-" + app.replace("_", "-")
+        icon_format = None
+        for ext in ("png", "jpg"):
+            if f"{icon}.{ext}" in files:
+                icon_format = ext
+                break
+        apps.append({
+            "name": app,
+            "module": f"{APP_DIR}/{app}",
+            "icon": f"{APP_DIR}/{icon}.{icon_format}" if icon_format else None,
+            "format": icon_format,
+            "label": app.replace("_", " ")
+        })
+    manifest["signature"] = signature
+    manifest["apps"] = apps
+    badger_os.state_save("launcher_apps", manifest)
+
+
+# Waking from halt trusts the manifest. Files are copied on over USB, which resets the badge,
+# so a cold start checks the directory once. LittleFS keeps no directory mtime to check instead
+if not woken_by_button or len(manifest["apps"]) == 0:
+    scan_apps()
+examples = manifest["apps"]
 
 # Approximate center lines for buttons A, B and C
 centers = (41, 147, 253)
 MAX_PAGE = math.ceil(len(examples) / 3)
 WIDTH = 296
 
-en_pin = Pin(25, Pin.OUT)
+# Areas of the screen that can be refreshed on their own, as (x, y, w, h).
+# Partial updates work in 8 pixel rows, so y and h are multiples of 8
+REGIONS = (
+    (0, 0, WIDTH, 16),    # Status bar
+    (0, 16, 94, 112),     # App under button A
+    (94, 16, 106, 112),   # App under button B
+    (200, 16, 80, 112),   # App under button C
+    (280, 16, 16, 112)    # Page indicator
+)
 
-def draw_battery_usage(x):
-    full_battery = 4.2
-    empty_battery = 2.8
-    usb_detect = Pin('WL_GPIO2', Pin.IN)
+# Start the battery's voltage divider settling while the launcher sets up
+battery.begin()
 
+def draw_battery_usage(x):
     # Check if USB power is connected
-    if usb_detect.value() == 1:
+    if battery.usb_powered():
         plug_icon = bytearray((
             0b00111100, 0b01100110, 0b01000010, 0b01000010,
             0b01111110, 0b01000010, 0b01000010, 0b00111100
@@ -62,23 +135,10 @@ def draw_battery_usage(x):
         display.set_pen(15)
         display.image(plug_icon, 8, 8, x + 85, 4)
         display.text("USB", x + 95, 4, WIDTH, 1.0)
+        return "USB"
     else:
-        # Measure battery voltage
-        en_pin.value(1)
-        time.sleep(0.1)
-        adc = ADC(29)
-        _ = adc.read_u16()  # Discard the first sample
-        total = 0
-        for _ in range(10):
-            total += adc.read_u16()
-            time.sleep(0.01)
-        avg_raw = total / 10
-        vsys_div = (avg_raw / 323.2) * 0.045
-        battery_voltage = vsys_div * (full_battery / 0.045)
-
-        # Calculate battery level as a percentage
-        b_level = 100.0 * (battery_voltage - empty_battery) / (full_battery - empty_battery)
-        b_level = max(0, min(100, b_level))  # Clamp to 0-100%
+        # Battery level from the monitor's smoothed reading, so drawing never waits on the ADC
+        b_level = battery.level()
 
         # Optimized rounding to nearest 5% with better precision
         b_level_rounded = int(5 * round(b_level / 5))
@@ -98,6 +158,7 @@ def draw_battery_usage(x):
         display.set_pen(15)
         display.rectangle(x + 10, 5, int(76.0 * (b_level / 100.0)), 6)
         display.text(f"{b_level_rounded}%", x + 91, 4, WIDTH, 1.0)
+        return f"{b_level_rounded}% {int(76.0 * (b_level / 100.0))}"
         
 def draw_disk_usage(x):
     _, f_used, _ = badger_os.get_disk_usage()
@@ -126,30 +187,69 @@ def draw_disk_usage(x):
     display.set_pen(15)
     display.rectangle(x + 12, 5, int(76 / 100.0 * f_used), 6)
     display.text("{:.2f}%".format(f_used), x + 91, 4, WIDTH, 1.0)
+    return "{:.2f}%".format(f_used)
     
-def render():
+# Decode an app's icon into the display and capture it as a bitmap for next time
+def decode_icon(app, x, y):
+    display.set_pen(15)
+    display.rectangle(x, y, ICON_SIZE, ICON_SIZE)
+    background = bitmap.sample(display, x, y)
+    lib = png if app["format"] == "png" else jpeg
+    try:
+        lib.open_file(app["icon"])
+        lib.decode(x, y)
+    except (OSError, RuntimeError):
+        return
+    bitmap.save(f"{ICON_CACHE_DIR}/{app['name']}.bin", bitmap.capture(display, x, y, ICON_SIZE, ICON_SIZE, background))
+
+
+# Draw an app's icon and return the width of its label, from the cache when the icon file is unchanged
+def draw_icon(app, x, y):
+    global icon_cache_changed
+    name = app["name"]
+    stamp = file_stamp(app["icon"])
+    entry = icon_cache.get(name)
+    if entry is not None and entry["stamp"] == stamp:
+        if stamp is None:
+            return entry["label_width"]
+        icon = bitmap.load(f"{ICON_CACHE_DIR}/{name}.bin")
+        if icon is not None:
+            display.set_pen(0)
+            bitmap.blit(display, icon, x, y)
+            return entry["label_width"]
+
+    if stamp is not None:
+        decode_icon(app, x, y)
+    display.set_pen(0)
+    icon_cache[name] = {
+        "stamp": stamp,
+        "label_width": display.measure_text(app["label"], FONT_SIZE)
+    }
+    icon_cache_changed = True
+    return icon_cache[name]["label_width"]
+
+
+# Draw the launcher. Unless a full refresh is asked for, only the regions whose content
+# differs from what is already on the display are sent to it, as one partial update or, when
+# they cover most of it, a full one
+def render(full=False):
     display.set_pen(15)
     display.clear()
     display.set_pen(0)
 
     max_icons = min(3, len(examples[(state["page"] * 3):]))
 
+    # What each region shows, to compare against the last render
+    screen = ["", "", "", "", "{}/{}".format(state["page"], MAX_PAGE)]
+    for i in range(max_icons):
+        screen[i + 1] = examples[i + (state["page"] * 3)]["name"]
+
     for i in range(max_icons):
         x = centers[i]
-        label = examples[i + (state["page"] * 3)]
-        icon_label = label.replace("_", "-")
-        icon = f"{APP_DIR}/icon-{icon_label}"
-        label = label.replace("_", " ")
-        for lib, ext in [(png, "png"), (jpeg, "jpg")]:
-            try:
-                lib.open_file(f"{icon}.{ext}")
-                lib.decode(x - 26, 30)
-                break
-            except (OSError, RuntimeError):
-                continue
+        app = examples[i + (state["page"] * 3)]
+        w = draw_icon(app, x - 26, 30)
         display.set_pen(0)
-        w = display.measure_text(label, FONT_SIZE)
-        display.text(label, int(x - (w / 2)), 16 + 80, WIDTH, FONT_SIZE)
+        display.text(app["label"], int(x - (w / 2)), 16 + 80, WIDTH, FONT_SIZE)
 
     for i in range(MAX_PAGE):
         x = 286
@@ -162,13 +262,30 @@ def render():
 
     display.set_pen(0)
     display.rectangle(0, 0, WIDTH, 16)
-    draw_disk_usage(50) 
-    draw_battery_usage(175) # call the battery bar
+    disk = draw_disk_usage(50)
+    power = draw_battery_usage(175) # call the battery bar
     display.set_pen(15)
     display.text("p00fOS", 4, 4, WIDTH, 1.0)
+    screen[0] = f"{disk} {power}"
+
+    last = state["screen"]
+    if full or len(last) != len(screen):
+        display.update()
+    else:
+        partial.update(display, [region for region, content, last_content in zip(REGIONS, screen, last) if content != last_content])
+    state["screen"] = screen
+
+    if icon_cache_changed:
+        save_icon_cache()
+
+    # The divider has long settled by now, so refresh the battery reading for next time if it is due
+    battery.poll()
 
-    display.update()
 
+def save_icon_cache():
+    global icon_cache_changed
+    badger_os.state_save("launcher_icons", icon_cache)
+    icon_cache_changed = False
 
 
 def wait_for_user_to_release_buttons():
@@ -179,8 +296,7 @@ def wait_for_user_to_release_buttons():
 def launch_example(index):
     wait_for_user_to_release_buttons()
 
-    file = examples[(state["page"] * 3) + index]
-    file = f"{APP_DIR}/{file}"
+    file = examples[(state["page"] * 3) + index]["module"]
 
     for k in locals().keys():
         if k not in ("gc", "file", "badger_os"):
@@ -212,7 +328,8 @@ def button(pin):
 if exited_to_launcher or not woken_by_button:
     wait_for_user_to_release_buttons()
     display.set_update_speed(badger2040.UPDATE_MEDIUM)
-    render()
+    render(full=True)
+    badger_os.state_save("launcher", state)  # Record what is now on the display for partial updates
 
 display.set_update_speed(badger2040.UPDATE_FAST)
 
@@ -0,0 +1,116 @@
+# Battery monitor shared by the launcher and apps.
+# Keeps a timestamped, smoothed battery voltage in /state, so drawing a battery level
+# returns straight away. A fresh sample is only taken once the reading is older than
+# REFRESH_S, and never waits for the voltage divider unless there is no reading at all.
+# On USB power VSYS reads the USB supply rather than the battery, so poll() takes no
+# samples then, and the reading starts again whenever the power source changes.
+import time
+import badger_os
+from machine import ADC, Pin
+
+FULL_BATTERY = 4.2
+EMPTY_BATTERY = 2.8
+
+REFRESH_S = 60        # Age at which a reading is refreshed
+RESTART_S = 3600      # Age at which the average starts again rather than smoothing
+SETTLE_MS = 100       # Time the voltage divider needs after being enabled
+SAMPLES = 10
+SMOOTHING = 0.3       # Weight given to a new sample
+
+# GPIO25 has to be high for the VSYS divider to be read on ADC 29
+en_pin = Pin(25, Pin.OUT)
+usb_detect = Pin('WL_GPIO2', Pin.IN)
+adc = None
+enabled_at = None
+
+reading = {
+    "voltage": 0.0,
+    "time": 0,
+    "usb": False      # The power source when the reading was taken
+}
+badger_os.state_load("battery", reading)
+
+
+def usb_powered():
+    return usb_detect.value() == 1
+
+
+# Drop the reading if it was taken on the other power source
+def check_source():
+    usb = usb_powered()
+    if reading["usb"] != usb:
+        reading["voltage"] = 0.0
+        reading["time"] = 0
+        reading["usb"] = usb
+        badger_os.state_save("battery", reading)
+
+
+# Enable the voltage divider now, so it has settled by the time a sample is wanted
+def begin():
+    global enabled_at
+    if enabled_at is None:
+        en_pin.value(1)
+        enabled_at = time.ticks_ms()
+
+
+def age():
+    if reading["time"] == 0:
+        return None
+    return time.time() - reading["time"]
+
+
+def due():
+    a = age()
+    return a is None or a < 0 or a >= REFRESH_S
+
+
+# Take a sample if the reading is due and the divider has settled, unless on USB power. Call this when idle
+def poll():
+    check_source()
+    if reading["usb"]:
+        return
+    begin()
+    if due() and time.ticks_diff(time.ticks_ms(), enabled_at) >= SETTLE_MS:
+        sample()
+
+
+def sample():
+    global adc
+    begin()
+    if adc is None:
+        adc = ADC(29)
+        adc.read_u16()  # Discard the first sample
+    total = 0
+    for _ in range(SAMPLES):
+        total += adc.read_u16()
+    avg_raw = total / SAMPLES
+    vsys_div = (avg_raw / 323.2) * 0.045
+    voltage = vsys_div * (FULL_BATTERY / 0.045)
+
+    a = age()
+    if a is None or a < 0 or a >= RESTART_S:
+        reading["voltage"] = voltage
+    else:
+        reading["voltage"] += SMOOTHING * (voltage - reading["voltage"])
+    reading["time"] = time.time()
+    badger_os.state_save("battery", reading)
+
+
+# The smoothed battery voltage. Only blocks, for the divider to settle, if there has never been a reading
+def voltage():
+    check_source()
+    if reading["time"] == 0:
+        begin()
+        wait = SETTLE_MS - time.ticks_diff(time.ticks_ms(), enabled_at)
+        if wait > 0:
+            time.sleep_ms(wait)
+        sample()
+    else:
+        poll()
+    return reading["voltage"]
+
+
+# Battery level as a percentage, clamped to 0-100%
+def level():
+    b_level = 100.0 * (voltage() - EMPTY_BATTERY) / (FULL_BATTERY - EMPTY_BATTERY)
+    return max(0, min(100, b_level))
@@ -0,0 +1,73 @@
+# 1-bit bitmaps captured from the display, for caching decoded images.
+# An image is decoded into the framebuffer once, read back as horizontal runs of
+# ink and saved. Drawing it again is one pixel_span() per run, with no JPEG or PNG
+# decode. Badger2040.image() is no help here, as it only takes 8 pixel wide rows.
+#
+# A bitmap is bytes: its width and height, then (row, column, length) for each run.
+# Both dimensions must fit in a byte.
+#
+# Runs are read from the framebuffer's buffer, which on Badger 2040 W is 1-bit and
+# packed by column: each column is HEIGHT // 8 bytes with the top pixel in the high bit.
+from badger2040 import HEIGHT
+
+COLUMN_BYTES = HEIGHT // 8
+
+
+# Read a pixel's bit from the framebuffer
+def sample(display, x, y):
+    fb = memoryview(display.display)
+    return (fb[x * COLUMN_BYTES + (y >> 3)] >> (7 - (y & 7))) & 1
+
+
+# Capture an area of the framebuffer as runs of the pixels that differ from the background bit.
+# Sample the background from the area after clearing it and before drawing the image into it
+def capture(display, x, y, w, h, background):
+    fb = memoryview(display.display)
+    runs = bytearray((w, h))
+    for row in range(h):
+        py = y + row
+        byte = py >> 3
+        shift = 7 - (py & 7)
+        start = -1
+        for col in range(w):
+            ink = ((fb[(x + col) * COLUMN_BYTES + byte] >> shift) & 1) != background
+            if ink and start < 0:
+                start = col
+            elif not ink and start >= 0:
+                runs.extend((row, start, col - start))
+                start = -1
+        if start >= 0:
+            runs.extend((row, start, w - start))
+    return bytes(runs)
+
+
+# Draw a bitmap with the current pen
+def blit(display, bitmap, x, y):
+    span = display.pixel_span
+    for i in range(2, len(bitmap), 3):
+        span(x + bitmap[i + 1], y + bitmap[i], bitmap[i + 2])
+
+
+# Draw a bitmap with each pixel scaled up to a square, one rectangle per run
+def blit_scaled(display, bitmap, x, y, scale):
+    rectangle = display.rectangle
+    for i in range(2, len(bitmap), 3):
+        rectangle(x + bitmap[i + 1] * scale, y + bitmap[i] * scale, bitmap[i + 2] * scale, scale)
+
+
+def size(bitmap):
+    return bitmap[0], bitmap[1]
+
+
+def save(path, bitmap):
+    with open(path, "wb") as f:
+        f.write(bitmap)
+
+
+# Load a saved bitmap, or None if there is not one
+def load(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
@@ -0,0 +1,247 @@
+# A persisted, sorted index of the files in a directory, for apps that page through a lot of them.
+# Each file has a fixed-width record: its name, a title line from it, its size and mtime, and a
+# CRC of its contents that the app can fill in. Entries are read one record at a time, so only
+# the ones in use are ever in RAM, however many files there are.
+#
+# At start up the directory is listed, without opening any files, and compared to the
+# listing the index was built from. The index is only rebuilt when that has changed: files
+# are sorted by name in small runs on flash and merged, and only new or changed files are
+# opened for their title, the rest being carried over from the old index.
+import binascii
+import os
+import struct
+
+INDEX_MAGIC = b"CAT1"
+HEADER = "<4sII"  # Magic, entries, signature of the listing
+HEADER_SIZE = struct.calcsize(HEADER)
+NAME_SIZE = 48
+TITLE_SIZE = 40
+RECORD = "<{}s{}sIII".format(NAME_SIZE, TITLE_SIZE)  # Name, title, size, mtime, CRC
+RECORD_SIZE = struct.calcsize(RECORD)
+RUN_SIZE = 64  # Names sorted in RAM at once while rebuilding
+
+
+class Entry:
+    def __init__(self, index, name, title, size, mtime, crc):
+        self.index = index
+        self.name = name
+        self.title = title
+        self.size = size
+        self.mtime = mtime
+        self.crc = crc
+
+
+def _text(data):
+    data = data.rstrip(b"\0")
+    while data:
+        try:
+            return data.decode()
+        except UnicodeError:
+            data = data[:-1]  # A title cut short mid-character
+    return ""
+
+
+def _unpack(index, data):
+    name, title, size, mtime, crc = struct.unpack(RECORD, data)
+    return Entry(index, _text(name), _text(title), size, mtime, crc)
+
+
+def _pack(entry):
+    return struct.pack(RECORD, entry.name.encode(), entry.title.encode()[:TITLE_SIZE],
+                       entry.size, entry.mtime, entry.crc)
+
+
+# Merge two files of sorted lines into a third
+def _merge(a, b, out):
+    with open(a, "r") as fa, open(b, "r") as fb, open(out, "w") as fo:
+        x = fa.readline()
+        y = fb.readline()
+        while x or y:
+            if not y or (x and x <= y):
+                fo.write(x)
+                x = fa.readline()
+            else:
+                fo.write(y)
+                y = fb.readline()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# A file's part of the listing's signature. The parts are added up, so the listing's order doesn't matter
+def _signature(name, size):
+    return binascii.crc32("{}:{}".format(name, size).encode())
+
+
+class Catalogue:
+    def __init__(self, directory, index_path, extension=".txt", title_line=0):
+        self.directory = directory
+        self.index_path = index_path
+        self.extension = extension
+        self.title_line = title_line
+        self.count = 0
+        self.signature = None
+        try:
+            with open(index_path, "rb") as f:
+                magic, count, signature = struct.unpack(HEADER, f.read(HEADER_SIZE))
+            if magic == INDEX_MAGIC:
+                self.count = count
+                self.signature = signature
+        except (OSError, ValueError):
+            pass
+
+    def __len__(self):
+        return self.count
+
+    # The files to index, as they are listed: name and size
+    def _listing(self):
+        for entry in os.ilistdir(self.directory):
+            name = entry[0]
+            if entry[1] == 0x8000 and name.endswith(self.extension):
+                if len(name.encode()) > NAME_SIZE:
+                    print("Catalogue: name too long, skipped: {}".format(name))
+                    continue
+                yield name, entry[3] if len(entry) > 3 else 0
+
+    # Rebuild the index if the directory's listing has changed. Returns True if it was rebuilt
+    def refresh(self):
+        signature = 0
+        count = 0
+        ordered = True
+        last = ""
+        for name, size in self._listing():
+            signature = (signature + _signature(name, size)) & 0xFFFFFFFF
+            count += 1
+            ordered = ordered and name >= last
+            last = name
+        if signature == self.signature and count == self.count:
+            return False
+        self._rebuild(ordered)
+        return True
+
+    # The directory's file names in order, one per line
+    def _sorted_names(self, ordered):
+        if ordered:
+            for name, _ in self._listing():
+                yield name
+            return
+
+        runs = []
+        names = []
+        for name, _ in self._listing():
+            names.append(name)
+            if len(names) == RUN_SIZE:
+                runs.append(self._write_run(len(runs), names))
+                names = []
+        if names or not runs:
+            runs.append(self._write_run(len(runs), names))
+
+        n = len(runs)
+        while len(runs) > 1:
+            merged = "{}.run{}".format(self.index_path, n)
+            n += 1
+            _merge(runs[0], runs[1], merged)
+            _remove(runs.pop(0))
+            _remove(runs.pop(0))
+            runs.append(merged)
+
+        with open(runs[0], "r") as f:
+            for line in f:
+                yield line[:-1]
+        _remove(runs[0])
+
+    def _write_run(self, n, names):
+        names.sort()
+        path = "{}.run{}".format(self.index_path, n)
+        with open(path, "w") as f:
+            for name in names:
+                f.write(name + "\n")
+        return path
+
+    # Read a file's title line
+    def _title(self, name):
+        try:
+            with open("{}/{}".format(self.directory, name), "r") as f:
+                for _ in range(self.title_line):
+                    f.readline()
+                title = f.readline().strip()
+        except (OSError, UnicodeError):
+            return ""
+        while len(title.encode()) > TITLE_SIZE:
+            title = title[:-1]
+        return title
+
+    def _rebuild(self, ordered):
+        new_path = self.index_path + ".new"
+        count = 0
+        signature = 0
+        try:
+            old = open(self.index_path, "rb")
+            old.seek(HEADER_SIZE)
+            old_count = self.count
+        except OSError:
+            old = None
+            old_count = 0
+        previous = None
+        read = 0
+        try:
+            with open(new_path, "wb") as f:
+                f.write(struct.pack(HEADER, INDEX_MAGIC, 0, 0))
+                for name in self._sorted_names(ordered):
+                    # Walk the old index alongside, as it is in the same order
+                    while read < old_count and (previous is None or previous.name < name):
+                        previous = _unpack(read, old.read(RECORD_SIZE))
+                        read += 1
+                    try:
+                        stat = os.stat("{}/{}".format(self.directory, name))
+                    except OSError:
+                        continue
+                    size, mtime = stat[6], stat[8]
+                    if previous is not None and previous.name == name and previous.size == size and previous.mtime == mtime:
+                        entry = Entry(count, name, previous.title, size, mtime, previous.crc)
+                    else:
+                        entry = Entry(count, name, self._title(name), size, mtime, 0)
+                    f.write(_pack(entry))
+                    signature = (signature + _signature(name, size)) & 0xFFFFFFFF
+                    count += 1
+                f.seek(0)
+                f.write(struct.pack(HEADER, INDEX_MAGIC, count, signature))
+        finally:
+            if old is not None:
+                old.close()
+        _remove(self.index_path)
+        os.rename(new_path, self.index_path)
+        self.count = count
+        self.signature = signature
+
+    def entry(self, index):
+        with open(self.index_path, "rb") as f:
+            f.seek(HEADER_SIZE + index * RECORD_SIZE)
+            return _unpack(index, f.read(RECORD_SIZE))
+
+    # The index of the entry for a file name, or None
+    def find(self, name):
+        low = 0
+        high = self.count - 1
+        with open(self.index_path, "rb") as f:
+            while low <= high:
+                mid = (low + high) // 2
+                f.seek(HEADER_SIZE + mid * RECORD_SIZE)
+                found = _text(f.read(NAME_SIZE))
+                if found == name:
+                    return mid
+                if found < name:
+                    low = mid + 1
+                else:
+                    high = mid - 1
+        return None
+
+    # Write back an entry changed by the app
+    def update(self, entry):
+        with open(self.index_path, "r+b") as f:
+            f.seek(HEADER_SIZE + entry.index * RECORD_SIZE)
+            f.write(_pack(entry))
@@ -0,0 +1,64 @@
+# Fetches several JSON documents at once with asyncio, so the radio is on for the slowest
+# request rather than for all of them one after another.
+#
+# Each request is (url, paths, timeout): the values at paths are pulled out of the response
+# with jsonstream as it arrives, a chunk at a time, so the body is never held whole. A request
+# that fails or takes longer than its timeout in seconds gives None rather than holding up or
+# losing the others.
+#   forecast, air = fetch.get_json_all(((URL, FIELDS, 10), (URL2, FIELDS2, 10)))
+import asyncio
+import jsonstream
+
+CHUNK_SIZE = 512
+
+
+def _split(url):
+    scheme, _, rest = url.partition("://")
+    host, _, path = rest.partition("/")
+    secure = scheme == "https"
+    port = 443 if secure else 80
+    if ":" in host:
+        host, port = host.split(":")
+        port = int(port)
+    return secure, host, port, "/" + path
+
+
+# The values at paths in the JSON body of a GET, over HTTP/1.0 so the body ends when the
+# connection closes. The connection is dropped as soon as every value has been found
+async def get(url, paths):
+    secure, host, port, path = _split(url)
+    reader, writer = await asyncio.open_connection(host, port, ssl=secure)
+    try:
+        writer.write("GET {} HTTP/1.0\r\nHost: {}\r\nConnection: close\r\n\r\n".format(path, host).encode())
+        await writer.drain()
+        status = int((await reader.readline()).split(None, 2)[1])
+        if status != 200:
+            raise OSError("HTTP status {}".format(status))
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass
+        parser = jsonstream.Parser(paths)
+        while True:
+            chunk = await reader.read(CHUNK_SIZE)
+            if not chunk or parser.feed(chunk):
+                break
+        return parser.finish()
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def get_json(url, paths, timeout):
+    try:
+        return await asyncio.wait_for(get(url, paths), timeout)
+    except asyncio.TimeoutError:
+        print("Timed out after {}s: {}".format(timeout, url))
+    except Exception as e:
+        print("Request failed: {} {}".format(url, e))
+    return None
+
+
+# The values from each (url, paths, timeout) request, or None for those that failed
+def get_json_all(requests):
+    async def fetch():
+        return await asyncio.gather(*(get_json(url, paths, timeout) for url, paths, timeout in requests))
+    return asyncio.run(fetch())
@@ -0,0 +1,14 @@
+# Size and modification time of a file, for telling whether something cached from it is stale.
+# Stamps are lists, so they can be kept in /state JSON and compared with what was saved.
+import os
+
+
+# Size and modification time of a file, or None if it is missing
+def file_stamp(path):
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+        return [stat[6], stat[8]]
+    except OSError:
+        return None
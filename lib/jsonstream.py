@@ -0,0 +1,224 @@
+# Pulls chosen values out of a JSON document as it arrives, such as from the .raw socket of a
+# urequests response or an asyncio stream, without building the rest of the document.
+#
+# Values are asked for by path, a tuple of object keys and array indexes, e.g.
+#   extract(r.raw, (("current_weather",), ("daily", "sunrise", 0)))
+# returns {("current_weather",): {...}, ("daily", "sunrise", 0): "..."}. Only the values at
+# those paths are parsed; everything else is stepped over a byte at a time as it arrives, and
+# reading stops as soon as every path has been found. Paths that aren't in the document are
+# left out of the result.
+#
+# extract() reads a stream itself. Where the data comes in some other way, feed a Parser the
+# chunks as they arrive instead, so only the chunk in hand is ever held:
+#   parser = Parser(paths)
+#   while not parser.feed(await reader.read(512)): ...
+#   values = parser.finish()
+import json
+
+CHUNK_SIZE = 256
+
+_QUOTE = ord('"')
+_BACKSLASH = ord("\\")
+_COLON = ord(":")
+_COMMA = ord(",")
+_OBJECT = ord("{")
+_OBJECT_END = ord("}")
+_ARRAY = ord("[")
+_ARRAY_END = ord("]")
+# Bytes are tested as ints, and MicroPython's bytes only find other bytes, so these are tuples
+_OPEN = (_OBJECT, _ARRAY)
+_CLOSE = (_OBJECT_END, _ARRAY_END)
+_SPACE = (32, 9, 13, 10)
+_DELIMITERS = _SPACE + (_COMMA,) + _CLOSE
+
+# What the parser expects next
+_VALUE = 0          # The start of the value at path
+_ITEM_OR_END = 1    # The first item of an array, or its end
+_KEY_OR_END = 2     # A member's key, or the end of the object
+_KEY = 3            # More of a key
+_COLON_NEXT = 4     # The colon after a key
+_STRING = 5         # More of a string value
+_NESTED = 6         # More of an object or array being stepped over or kept whole
+_ATOM = 7           # More of a number, true, false or null
+_AFTER = 8          # A comma or the end of the enclosing object or array
+_END = 9            # Nothing but white space
+
+
+def _ended():
+    return ValueError("JSON ended early")
+
+
+class Parser:
+    def __init__(self, paths):
+        self.wanted = set(paths)
+        self.prefixes = set()
+        for path in self.wanted:
+            for i in range(len(path)):
+                self.prefixes.add(path[:i])
+        self.found = {}
+        # The objects and arrays open on the way to a wanted path, as [path, index], where
+        # index is the current item's for an array and None for an object
+        self.stack = []
+        self.state = _VALUE
+        self.path = ()
+        self.sink = None      # The bytes of a wanted value, while it is read
+        self.key = None
+        self.depth = 0
+        self.quoted = False   # Inside a string in a _NESTED value
+        self.escaped = False
+
+    def done(self):
+        return len(self.found) == len(self.wanted)
+
+    # The value at self.path has been read
+    def _value_done(self):
+        if self.sink is not None:
+            self.found[self.path] = json.loads(str(self.sink, "utf-8"))
+            self.sink = None
+        self.state = _AFTER if self.stack else _END
+
+    def _begin(self, c):
+        path = self.path
+        if path in self.wanted:
+            self.sink = bytearray((c,))
+        elif path in self.prefixes and c == _OBJECT:
+            self.stack.append([path, None])
+            self.state = _KEY_OR_END
+            return
+        elif path in self.prefixes and c == _ARRAY:
+            self.stack.append([path, 0])
+            self.state = _ITEM_OR_END
+            return
+        if c == _QUOTE:
+            self.escaped = False
+            self.state = _STRING
+        elif c in _OPEN:
+            self.depth = 1
+            self.quoted = False
+            self.state = _NESTED
+        elif c in _CLOSE or c == _COMMA or c == _COLON:
+            raise ValueError("Bad JSON value")
+        else:
+            self.state = _ATOM
+
+    # Read the next chunk of the document. Returns True once every path has been found
+    def feed(self, chunk):
+        i = 0
+        n = len(chunk)
+        while i < n:
+            if self.done():
+                return True
+            c = chunk[i]
+            i += 1
+            state = self.state
+            sink = self.sink
+            if state == _STRING:
+                if sink is not None:
+                    sink.append(c)
+                if self.escaped:
+                    self.escaped = False
+                elif c == _BACKSLASH:
+                    self.escaped = True
+                elif c == _QUOTE:
+                    self._value_done()
+            elif state == _NESTED:
+                if sink is not None:
+                    sink.append(c)
+                if self.quoted:
+                    if self.escaped:
+                        self.escaped = False
+                    elif c == _BACKSLASH:
+                        self.escaped = True
+                    elif c == _QUOTE:
+                        self.quoted = False
+                elif c == _QUOTE:
+                    self.quoted = True
+                elif c in _OPEN:
+                    self.depth += 1
+                elif c in _CLOSE:
+                    self.depth -= 1
+                    if self.depth == 0:
+                        self._value_done()
+            elif state == _ATOM:
+                # A number, true, false or null runs up to the next delimiter
+                if c in _DELIMITERS:
+                    self._value_done()
+                    i -= 1
+                elif sink is not None:
+                    sink.append(c)
+            elif state == _KEY:
+                self.key.append(c)
+                if self.escaped:
+                    self.escaped = False
+                elif c == _BACKSLASH:
+                    self.escaped = True
+                elif c == _QUOTE:
+                    self.state = _COLON_NEXT
+            elif c in _SPACE:
+                continue
+            elif state == _VALUE:
+                self._begin(c)
+            elif state == _AFTER:
+                top = self.stack[-1]
+                if c == _COMMA:
+                    if top[1] is None:
+                        self.state = _KEY_OR_END
+                    else:
+                        top[1] += 1
+                        self.path = top[0] + (top[1],)
+                        self.state = _VALUE
+                elif c == (_OBJECT_END if top[1] is None else _ARRAY_END):
+                    self.path = self.stack.pop()[0]
+                    self._value_done()
+                else:
+                    raise ValueError("Bad JSON object" if top[1] is None else "Bad JSON array")
+            elif state == _ITEM_OR_END:
+                if c == _ARRAY_END:
+                    self.path = self.stack.pop()[0]
+                    self._value_done()
+                else:
+                    self.path = self.stack[-1][0] + (0,)
+                    self._begin(c)
+            elif state == _KEY_OR_END:
+                if c == _QUOTE:
+                    self.key = bytearray()
+                    self.escaped = False
+                    self.state = _KEY
+                elif c == _OBJECT_END:
+                    self.path = self.stack.pop()[0]
+                    self._value_done()
+                else:
+                    raise ValueError("Bad JSON object")
+            elif state == _COLON_NEXT:
+                if c != _COLON:
+                    raise ValueError("JSON object key without a value")
+                key = self.key
+                if b"\\" in key:
+                    key = json.loads('"' + str(key, "utf-8"))
+                else:
+                    key = str(key[:-1], "utf-8")
+                self.key = None
+                self.path = self.stack[-1][0] + (key,)
+                self.state = _VALUE
+            else:
+                raise ValueError("Data after the end of the JSON")
+        return self.done()
+
+    # The values found, once the document has ended. Raises ValueError if it ended part way
+    # through, unless every path had already been found
+    def finish(self):
+        if self.state == _ATOM:
+            self._value_done()
+        if self.state != _END and not self.done():
+            raise _ended()
+        return self.found
+
+
+def extract(stream, paths):
+    parser = Parser(paths)
+    while not parser.done():
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        parser.feed(chunk)
+    return parser.finish()
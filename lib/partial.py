@@ -0,0 +1,31 @@
+# Partial display updates shared by the launcher and apps.
+# Every partial update blocks for about as long as a full UPDATE_FAST refresh, so the areas that
+# changed are sent as one: their bounding box, with y and h rounded out to the 8 pixel rows the
+# panel is addressed in. When that box covers half the panel or more, a full update costs no
+# more and clears any ghosting, so one is sent instead.
+#   partial.update(display, [(0, 0, WIDTH, 16), (280, 16, 16, 112)])
+from badger2040 import WIDTH, HEIGHT
+
+MAX_AREA = WIDTH * HEIGHT // 2
+
+
+# The (x, y, w, h) box around all the areas, with y and h multiples of 8, or None if there are none
+def bounds(areas):
+    if not areas:
+        return None
+    left = min(x for x, _, _, _ in areas)
+    top = min(y for _, y, _, _ in areas) & ~7
+    right = max(x + w for x, _, w, _ in areas)
+    bottom = (max(y + h for _, y, _, h in areas) + 7) & ~7
+    return left, top, right - left, min(bottom, HEIGHT) - top
+
+
+# Refresh the areas of the display that changed, with a single update
+def update(display, areas):
+    box = bounds(areas)
+    if box is None:
+        return
+    if box[2] * box[3] >= MAX_AREA:
+        display.update()
+    else:
+        display.partial_update(*box)
@@ -0,0 +1,58 @@
+# Cached text measurement for the Hershey and bitmap fonts.
+# Words are measured once per font and size, so a line's width is a running
+# sum of word widths rather than a fresh measure_text() of the whole line.
+from collections import OrderedDict
+
+WORD_LIMIT = 256   # Words remembered per font and size, a few KB of RAM each
+TABLE_LIMIT = 2    # Font and size combinations kept at once
+
+
+class TextWidths:
+    def __init__(self, display, word_limit=WORD_LIMIT, table_limit=TABLE_LIMIT):
+        self.display = display
+        self.word_limit = word_limit
+        self.table_limit = table_limit
+        self.tables = OrderedDict()
+        self.table = None
+        self.size = 1.0
+        self.space = 0
+
+    # Set the font on the display and select the matching width table
+    def use(self, font, size):
+        self.display.set_font(font)
+        self.size = size
+        key = "{}:{:.2f}".format(font, size)
+        table = self.tables.pop(key, None)
+        if table is None:
+            if len(self.tables) >= self.table_limit:
+                del self.tables[next(iter(self.tables))]
+            table = OrderedDict()
+        self.tables[key] = table
+        self.table = table
+        self.space = self.measure(" ")
+
+    # Width of a word, measured on first use and then served from the table.
+    # The least recently used word is dropped once the table is full
+    def measure(self, word):
+        table = self.table
+        width = table.pop(word, None)
+        if width is None:
+            width = self.display.measure_text(word, self.size)
+            if len(table) >= self.word_limit:
+                del table[next(iter(table))]
+        table[word] = width
+        return width
+
+    # Trim text from the end until it fits within the given width.
+    # Character widths are summed to find the cut, then the result is measured once
+    # to catch any rounding in the per character widths
+    def fit(self, text, width):
+        total = 0
+        for i in range(len(text)):
+            total += self.measure(text[i])
+            if total > width:
+                text = text[:i]
+                break
+        while len(text) > 0 and self.display.measure_text(text, self.size) > width:
+            text = text[:-1]
+        return text
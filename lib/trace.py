@@ -0,0 +1,215 @@
+# Opt-in profiling for apps.
+# Counts each drawing primitive, image decode, file open, seek and byte read from flash,
+# and how much the heap grew, and records them per frame, a frame ending at each display
+# update. Frames go into a ring buffer in /state/trace.bin holding the last TRACE_SLOTS.
+#
+# Tracing is off until "enabled" is set to true in /state/trace.json. Until then display(),
+# decoder() and open() hand back what they are given, so apps pay nothing for it.
+# Read the trace back with: mpremote exec "import trace; trace.dump()"
+import gc
+import os
+import struct
+import time
+import badger_os
+
+TRACE_FILE = "/state/trace.bin"
+TRACE_MAGIC = b"TRC2"  # Bump when RECORD changes
+TRACE_SLOTS = 64
+
+# Counted calls, in the order they are stored
+PRIMITIVES = ("text", "measure_text", "rectangle", "line", "pixel", "pixel_span", "image",
+              "clear", "set_font", "decode", "update", "partial_update")
+DECODE = PRIMITIVES.index("decode")
+
+HEADER = "<4sHH"  # Magic, slots, next slot to write
+HEADER_SIZE = struct.calcsize(HEADER)
+# App, ticks at the end, duration in ms, heap growth, opens, seeks, bytes read, then the counts
+RECORD = "<8sIIiIII" + "I" * len(PRIMITIVES)
+RECORD_SIZE = struct.calcsize(RECORD)
+
+OPENS = 0
+SEEKS = 1
+READ = 2
+
+settings = {
+    "enabled": False
+}
+badger_os.state_load("trace", settings)
+enabled = settings["enabled"]
+
+_open = open
+app = b""
+counts = [0] * len(PRIMITIVES)
+io = [0, 0, 0]
+started = 0
+alloc = 0
+
+
+# Start counting afresh for the next frame
+def begin():
+    global started, alloc
+    for i in range(len(counts)):
+        counts[i] = 0
+    for i in range(len(io)):
+        io[i] = 0
+    started = time.ticks_ms()
+    alloc = gc.mem_alloc()
+
+
+# Record the frame so far in the ring buffer. The write itself is left out of the next frame
+def end_frame():
+    now = time.ticks_ms()
+    record = struct.pack(RECORD, app, now, time.ticks_diff(now, started), gc.mem_alloc() - alloc,
+                         io[OPENS], io[SEEKS], io[READ], *counts)
+    try:
+        f = _open(TRACE_FILE, "r+b")
+    except OSError:
+        f = _open(TRACE_FILE, "w+b")
+    header = f.read(HEADER_SIZE)
+    slot = 0
+    if len(header) == HEADER_SIZE:
+        magic, slots, slot = struct.unpack(HEADER, header)
+        if magic != TRACE_MAGIC or slots != TRACE_SLOTS:
+            # Laid out for other records, so start the file afresh
+            f.close()
+            f = _open(TRACE_FILE, "w+b")
+            slot = 0
+    with f:
+        f.seek(HEADER_SIZE + slot * RECORD_SIZE)
+        f.write(record)
+        f.seek(0)
+        f.write(struct.pack(HEADER, TRACE_MAGIC, TRACE_SLOTS, (slot + 1) % TRACE_SLOTS))
+    begin()
+
+
+def _counted(function, index):
+    def call(*args, **kwargs):
+        counts[index] += 1
+        return function(*args, **kwargs)
+    return call
+
+
+def _frame(function, index):
+    def call(*args, **kwargs):
+        counts[index] += 1
+        result = function(*args, **kwargs)
+        end_frame()
+        return result
+    return call
+
+
+class TracedDisplay:
+    def __init__(self, display):
+        self._display = display
+        for i, name in enumerate(PRIMITIVES):
+            if i != DECODE:
+                wrap = _frame if name in ("update", "partial_update") else _counted
+                setattr(self, name, wrap(getattr(display, name), i))
+
+    def __getattr__(self, item):
+        return getattr(self._display, item)
+
+
+class TracedDecoder:
+    def __init__(self, decoder):
+        self._decoder = decoder
+
+    # The decoder reads the whole file, so count its size as read
+    def open_file(self, filename):
+        io[OPENS] += 1
+        try:
+            io[READ] += os.stat(filename)[6]
+        except OSError:
+            pass
+        return self._decoder.open_file(filename)
+
+    def decode(self, *args, **kwargs):
+        counts[DECODE] += 1
+        return self._decoder.decode(*args, **kwargs)
+
+    def __getattr__(self, item):
+        return getattr(self._decoder, item)
+
+
+class TracedFile:
+    def __init__(self, f):
+        self._f = f
+
+    def read(self, *args):
+        data = self._f.read(*args)
+        io[READ] += len(data)
+        return data
+
+    def readinto(self, *args):
+        n = self._f.readinto(*args)
+        io[READ] += n or 0
+        return n
+
+    def readline(self, *args):
+        data = self._f.readline(*args)
+        io[READ] += len(data)
+        return data
+
+    def seek(self, *args):
+        io[SEEKS] += 1
+        return self._f.seek(*args)
+
+    def __getattr__(self, item):
+        return getattr(self._f, item)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._f.close()
+
+
+# Wrap the app's Badger2040, tagging its frames with the app's name
+def display(badger, name):
+    global app
+    if not enabled:
+        return badger
+    app = name.encode()[:8]
+    begin()
+    return TracedDisplay(badger)
+
+
+# Wrap a jpegdec.JPEG or pngdec.PNG
+def decoder(d):
+    return TracedDecoder(d) if enabled else d
+
+
+def open(path, mode="r"):
+    f = _open(path, mode)
+    if not enabled:
+        return f
+    io[OPENS] += 1
+    return TracedFile(f)
+
+
+# The recorded frames, oldest first
+def frames():
+    try:
+        f = _open(TRACE_FILE, "rb")
+    except OSError:
+        return
+    with f:
+        header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            return
+        magic, slots, slot = struct.unpack(HEADER, header)
+        if magic != TRACE_MAGIC:
+            return
+        for i in range(slots):
+            f.seek(HEADER_SIZE + ((slot + i) % slots) * RECORD_SIZE)
+            data = f.read(RECORD_SIZE)
+            if len(data) == RECORD_SIZE and data[0] != 0:
+                yield struct.unpack(RECORD, data)
+
+
+def dump():
+    for frame in frames():
+        name, ticks, ms, heap, opens, seeks, read = frame[:7]
+        calls = " ".join("{}={}".format(PRIMITIVES[i], n) for i, n in enumerate(frame[7:]) if n)
+        print("{} @{} {}ms heap {:+d} opens {} seeks {} read {} {}".format(
+            name.rstrip(b"\0").decode(), ticks, ms, heap, opens, seeks, read, calls))
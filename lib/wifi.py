@@ -0,0 +1,197 @@
+# Wi-Fi connection shared by the apps.
+# Remembers the access point (BSSID and channel) and the DHCP lease of the last connection in
+# /state, so the next one goes straight to that access point with the same address instead of
+# scanning for the strongest one and waiting for DHCP. If that doesn't work within FAST_TIMEOUT_S,
+# or the lease is older than LEASE_S, it connects the slow way and remembers the result.
+# A connection that is already up, e.g. made by another app since the last reset, is reused.
+# In auto mode, set by the Wi-Fi app, the network is chosen from the known ones in NETWORKS_FILE.
+#   if wifi.ensure_connected(10, display.status_handler):
+import binascii
+import time
+import badger_os
+import network
+
+TIMEOUT_S = 10        # Default time allowed for the whole connection
+FAST_TIMEOUT_S = 3    # Time allowed for reconnecting to the remembered access point
+LEASE_S = 12 * 3600   # Age at which the remembered address is asked for again
+ROAM_MARGIN_DB = 8    # How much stronger another network must be to move off the last one
+POLL_MS = 50
+
+NETWORKS_FILE = "/wifi_networks.txt"  # Known networks for auto mode, one "SSID|PSK|COUNTRY" a line
+
+cache = {
+    "ssid": None,
+    "bssid": None,    # Hex, as JSON has no bytes
+    "channel": None,
+    "ifconfig": None,
+    "time": 0,
+    "auto": False     # Connect to the best known network rather than the one in WIFI_CONFIG.py
+}
+badger_os.state_load("wifi", cache)
+
+wlan = network.WLAN(network.STA_IF)
+
+
+# Wait for the connection to come up, give up early if it fails. Returns True once connected
+def _wait(deadline):
+    while time.ticks_diff(deadline, time.ticks_ms()) > 0:
+        status = wlan.status()
+        if status == network.STAT_GOT_IP:
+            return True
+        if status < 0:
+            return False
+        time.sleep_ms(POLL_MS)
+    return wlan.isconnected()
+
+
+def _reusable(ssid):
+    if cache["ssid"] != ssid or cache["bssid"] is None or cache["ifconfig"] is None:
+        return False
+    # The clock may have been set back a little since, e.g. by NTP
+    return abs(time.time() - cache["time"]) < LEASE_S
+
+
+# Connect to the remembered access point with the remembered address
+def _reconnect(ssid, psk, deadline):
+    wlan.ifconfig(tuple(cache["ifconfig"]))
+    wlan.connect(ssid, psk, bssid=binascii.unhexlify(cache["bssid"]), channel=cache["channel"])
+    if time.ticks_diff(deadline, time.ticks_ms()) > FAST_TIMEOUT_S * 1000:
+        deadline = time.ticks_add(time.ticks_ms(), FAST_TIMEOUT_S * 1000)
+    if _wait(deadline):
+        return True
+    print("Wi-Fi: fast reconnect failed")
+    wlan.disconnect()
+    wlan.ifconfig("dhcp")
+    return False
+
+
+# The BSSID and channel of the strongest access point for ssid, or None if it can't be seen
+def _strongest(ssid):
+    best = None
+    ssid = ssid.encode()
+    for found, bssid, channel, rssi, _, _ in wlan.scan():
+        if found == ssid and (best is None or rssi > best[2]):
+            best = (bssid, channel, rssi)
+    return best and best[:2]
+
+
+def _remember(ssid, bssid, channel):
+    cache["ssid"] = ssid
+    cache["bssid"] = binascii.hexlify(bssid).decode()
+    cache["channel"] = channel
+    cache["ifconfig"] = list(wlan.ifconfig())
+    cache["time"] = time.time()
+    badger_os.state_save("wifi", cache)
+
+
+# The known networks that are in range, strongest first, from a single scan. known is a list
+# of (ssid, psk, country); each one in range is given with the BSSID, channel and RSSI of its
+# strongest access point. The network last connected to counts as ROAM_MARGIN_DB stronger,
+# so the badge sticks with it, and its fast reconnect, unless another is clearly better.
+def rank(known):
+    seen = {}
+    for found, bssid, channel, rssi, _, _ in wlan.scan():
+        if found not in seen or rssi > seen[found][2]:
+            seen[found] = (bssid, channel, rssi)
+    ranked = []
+    for ssid, psk, country in known:
+        ap = seen.get(ssid.encode())
+        if ap is not None:
+            ranked.append((ssid, psk, country) + ap)
+    ranked.sort(key=lambda n: n[5] + (ROAM_MARGIN_DB if n[0] == cache["ssid"] else 0), reverse=True)
+    return ranked
+
+
+def set_auto(auto):
+    cache["auto"] = auto
+    badger_os.state_save("wifi", cache)
+
+
+# The networks in NETWORKS_FILE, as (ssid, psk, country)
+def known_networks():
+    known = []
+    try:
+        with open(NETWORKS_FILE, "r") as f:
+            for line in f:
+                fields = line.strip().split("|")
+                if len(fields) == 3:
+                    known.append(tuple(fields))
+    except OSError:
+        pass
+    return known
+
+
+# Connect unless already connected: to the network in WIFI_CONFIG.py, or in auto mode to the
+# best known network in range. status_handler, such as Badger2040.status_handler, is told
+# (mode, connected, ip) as display.connect() would. Returns True if connected within timeout seconds
+def ensure_connected(timeout=TIMEOUT_S, status_handler=None):
+    if wlan.isconnected():
+        return True
+    if cache["auto"]:
+        return connect_best(known_networks(), timeout, status_handler) is not None
+    import WIFI_CONFIG
+    if WIFI_CONFIG.COUNTRY == "":
+        raise RuntimeError("You must populate WIFI_CONFIG.py for networking.")
+    return connect(WIFI_CONFIG.SSID, WIFI_CONFIG.PSK, WIFI_CONFIG.COUNTRY, timeout, status_handler)
+
+
+def _start(country, status_handler):
+    network.country(country)
+    wlan.active(True)
+    wlan.config(pm=0xa11140)  # Turn WiFi power saving off for some slow APs
+    if status_handler:
+        status_handler("STA", False, "")
+
+
+def _connected(ssid, status_handler):
+    print("Wi-Fi: connected to", ssid)
+    if status_handler:
+        status_handler("STA", True, wlan.ifconfig()[0])
+
+
+# Join ssid through the access point ap, (bssid, channel), or by name alone if ap is None
+def _join(ssid, psk, ap, deadline):
+    if ap is None:
+        wlan.connect(ssid, psk)
+    else:
+        wlan.connect(ssid, psk, bssid=ap[0], channel=ap[1])
+    if not _wait(deadline):
+        print("Wi-Fi: could not connect to", ssid, "status", wlan.status())
+        wlan.disconnect()
+        return False
+    if ap is not None:
+        _remember(ssid, *ap)
+    return True
+
+
+def connect(ssid, psk, country, timeout=TIMEOUT_S, status_handler=None):
+    deadline = time.ticks_add(time.ticks_ms(), int(timeout * 1000))
+    _start(country, status_handler)
+    if not (_reusable(ssid) and _reconnect(ssid, psk, deadline)):
+        # Hidden networks don't show up in a scan, but can still be joined by name
+        if not _join(ssid, psk, _strongest(ssid), deadline):
+            return False
+    _connected(ssid, status_handler)
+    return True
+
+
+# Connect to the best of the known networks, (ssid, psk, country), that is in range: the last
+# one connected to if it takes its fast reconnect, otherwise each in turn from rank() until
+# one connects. Returns the SSID connected to, or None
+def connect_best(known, timeout=TIMEOUT_S, status_handler=None):
+    if not known:
+        return None
+    deadline = time.ticks_add(time.ticks_ms(), int(timeout * 1000))
+    last = [n for n in known if n[0] == cache["ssid"]]
+    _start((last or known)[0][2], status_handler)
+    if last and _reusable(last[0][0]) and _reconnect(last[0][0], last[0][1], deadline):
+        _connected(last[0][0], status_handler)
+        return last[0][0]
+    for ssid, psk, _, bssid, channel, rssi in rank(known):
+        if time.ticks_diff(deadline, time.ticks_ms()) <= 0:
+            break
+        print("Wi-Fi: trying", ssid, rssi, "dBm")
+        if _join(ssid, psk, (bssid, channel), deadline):
+            _connected(ssid, status_handler)
+            return ssid
+    return None
@@ -0,0 +1,394 @@
+"""Runs Badger 2040 W apps on a PC, for timing and comparing renders without a badge.
+
+The apps run unmodified. Their imports go through a sandbox which hands them stand-ins for
+the device modules (badger2040, badger_os, machine, network, urequests, jpegdec, pngdec, qrcode,
+ntptime, and the MicroPython flavours of os, time, gc and binascii) from device/, and loads
+everything else that is on the badge from the filesystem root, including lib/. Paths are
+mapped into that root, which should be a copy of the repo, as apps write to /state.
+
+    emu = Emulator("/tmp/badge", presses=["down", "down", "a"])
+    emu.run("examples/ebook.py")
+    emu.save_pgm("ebook.pgm")
+    print(emu.counts)
+
+Buttons are a script of presses: on USB power each halt() takes the next one, and on battery
+halt() powers the badge off and the next press boots the app again from scratch. The run ends
+when an app waits for a press and there are none left. Time is emulated, so sleeps cost nothing.
+"""
+import builtins
+import calendar
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+
+from . import graphics, images
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "device")
+DEVICE_MODULES = sorted(name[:-3] for name in os.listdir(DEVICE_DIR) if name.endswith(".py"))
+SEARCH_PATH = ("", "lib")
+
+BUTTONS = {"down": 11, "a": 12, "b": 13, "c": 14, "up": 15}
+
+# A press is a tap: buttons read as released once the app has slept this long since
+PRESS_S = 0.1
+
+# The launcher's battery reading is calibrated for this many ADC counts per volt
+ADC_PER_VOLT = 323.2 / 4.2
+
+DEFAULT_TIME = (2024, 6, 1, 12, 0, 0, 0, 0)
+DEFAULT_LEASE = ("192.168.1.42", "255.255.255.0", "192.168.1.1", "192.168.1.1")
+
+
+# These derive from BaseException so apps catching Exception do not swallow them
+class Halted(BaseException):
+    """The app waited for a press and the script had none left."""
+
+
+class PowerOff(BaseException):
+    """The badge cut its own power, optionally with an RTC alarm set for `minutes`."""
+
+    def __init__(self, minutes=None):
+        super().__init__(minutes)
+        self.minutes = minutes
+
+
+class Reset(BaseException):
+    """machine.reset() was called."""
+
+
+def parse_press(press):
+    if isinstance(press, int):
+        return frozenset((press,))
+    if isinstance(press, str):
+        return frozenset(BUTTONS[name.strip().lower()] for name in press.split("+"))
+    return frozenset(p if isinstance(p, int) else BUTTONS[p.lower()] for p in press)
+
+
+# MicroPython's locals() is the module's globals, even in a function, and its dicts can be
+# changed while their keys are iterated. The launcher relies on both to free memory before
+# launching an app
+class _Globals:
+    def __init__(self, namespace):
+        self.namespace = namespace
+
+    def keys(self):
+        return list(self.namespace)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __getitem__(self, key):
+        return self.namespace[key]
+
+    def __setitem__(self, key, value):
+        self.namespace[key] = value
+
+    def __delitem__(self, key):
+        del self.namespace[key]
+
+    def __contains__(self, key):
+        return key in self.namespace
+
+    def __len__(self):
+        return len(self.namespace)
+
+    def get(self, key, default=None):
+        return self.namespace.get(key, default)
+
+    def items(self):
+        return list(self.namespace.items())
+
+    def values(self):
+        return list(self.namespace.values())
+
+
+def _locals():
+    return _Globals(sys._getframe(1).f_globals)
+
+
+def frame_diff(a, b):
+    return sum(1 for p, q in zip(a, b) if p != q)
+
+
+# A copy of the repo to use as the badge's filesystem, so apps' writes do not touch the tree
+def scratch_root(repo=REPO):
+    root = os.path.join(tempfile.mkdtemp(prefix="badger_emu-"), "root")
+    shutil.copytree(repo, root, ignore=shutil.ignore_patterns(".git", "tools", "__pycache__", "requests.jsonl"))
+    return root
+
+
+def write_wifi_config(root, ssid, psk, country="GB"):
+    with open(os.path.join(root, "WIFI_CONFIG.py"), "w") as f:
+        f.write('SSID = "{}"\nPSK = "{}"\nCOUNTRY = "{}"\n'.format(ssid, psk, country))
+
+
+class Emulator:
+    Halted = Halted
+    PowerOff = PowerOff
+    Reset = Reset
+    BUTTON_PINS = frozenset(BUTTONS.values())
+    ADC_PER_VOLT = ADC_PER_VOLT
+    images = images
+
+    def __init__(self, root, presses=(), usb=True, battery=3.9, start=DEFAULT_TIME, networks=(),
+                 lease=DEFAULT_LEASE, routes=None, idle=0, keep_frames=False, verbose=True):
+        self.root = os.path.abspath(root)
+        self.events = deque(parse_press(p) for p in presses)
+        self.usb = usb
+        self.battery = battery
+        self.networks = [self._access_point(i, ap) for i, ap in enumerate(networks)]
+        self.lease = tuple(lease)
+        self.routes = list((routes or {}).items())
+        self.idle = idle
+        self.keep_frames = keep_frames
+        self.verbose = verbose
+
+        self.counts = Counter()
+        self.frames = []
+        self.panel = bytearray([15]) * (graphics.WIDTH * graphics.HEIGHT)
+        self.log = []
+        self.wlans = {}
+        self.boots = 0
+        self.slept = 0.0
+        self.started = time.monotonic()
+        self.epoch = self.mktime(start)
+        self.displays = []
+        self.display = None
+        self._boot(frozenset(), False)
+
+    def _access_point(self, i, ap):
+        ap = dict(ap)
+        ap.setdefault("psk", "")
+        ap.setdefault("bssid", bytes((0x02, 0, 0, 0, 0, i + 1)))
+        ap.setdefault("channel", 1 + (i * 5) % 11)
+        ap.setdefault("rssi", -50 - i * 10)
+        return ap
+
+    # ---- running apps ----
+
+    def _boot(self, wake, rtc):
+        self.modules = {}
+        self.irqs = {}
+        self.wake = wake
+        self._press(wake)
+        self.woken_by_rtc = rtc
+        self.cwd = "/"
+        self.wlans = {}
+        self.in_irq = False
+
+    def run(self, app, max_boots=100):
+        """Run an app, relative to the root, until the presses run out. Returns self."""
+        entry = app
+        while self.boots < max_boots:
+            self.boots += 1
+            try:
+                self.run_file(app)
+                return self
+            except (Halted, SystemExit):
+                return self
+            except PowerOff as e:
+                if self.events:
+                    wake, rtc = self.events.popleft(), False
+                elif e.minutes is not None and self.idle > 0:
+                    self.idle -= 1
+                    # The firmware's alarm is set to the minute, with seconds = 0, so it goes off
+                    # up to a minute sooner than asked
+                    self.slept += e.minutes * 60 - int(self.now()) % 60
+                    wake, rtc = frozenset(), True
+                else:
+                    return self
+                app = entry
+            except Reset:
+                wake, rtc = frozenset(), False
+                app = "main.py" if os.path.exists(self.path("/main.py")) else entry
+            self._boot(wake, rtc)
+        return self
+
+    def run_file(self, app):
+        name = app[:-3] if app.endswith(".py") else app
+        return self._exec(self.path(app), name.lstrip("/"), self._builtins())
+
+    def launch(self, file):
+        """badger_os.launch(): import the app in the running interpreter."""
+        name = file.lstrip("/")
+        if self.import_module(name) is None:
+            raise ImportError("no module named '{}'".format(file))
+
+    def import_module(self, name):
+        if name in self.modules:
+            return self.modules[name]
+        if name in DEVICE_MODULES:
+            return self._exec(os.path.join(DEVICE_DIR, name + ".py"), name, vars(builtins), {"emu": self})
+        relative = name.replace(".", "/") if "/" not in name else name
+        for folder in SEARCH_PATH:
+            path = os.path.join(self.root, folder, relative + ".py")
+            if os.path.isfile(path):
+                return self._exec(path, name, self._builtins())
+        return None
+
+    def _exec(self, path, name, sandbox, extra=None):
+        module = type(builtins)(name)
+        module.__dict__["__builtins__"] = sandbox
+        module.__dict__.update(extra or {})
+        self.modules[name] = module
+        with open(path, "rb") as f:
+            code = compile(f.read(), path, "exec")
+        try:
+            exec(code, module.__dict__)
+        except Exception:
+            self.modules.pop(name, None)
+            raise
+        return module
+
+    def _builtins(self):
+        sandbox = dict(vars(builtins))
+        sandbox["__import__"] = self._import
+        sandbox["open"] = self.open
+        sandbox["print"] = self.print
+        sandbox["locals"] = _locals
+        return sandbox
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0:
+            module = self.import_module(name)
+            if module is not None:
+                return module
+        return builtins.__import__(name, globals, locals, fromlist, level)
+
+    def print(self, *args, sep=" ", end="\n", **kwargs):
+        line = sep.join(str(a) for a in args)
+        self.log.append(line)
+        if self.verbose:
+            print(line, end=end)
+
+    # ---- filesystem ----
+
+    def path(self, path):
+        path = str(path)
+        if not path.startswith("/"):
+            path = self.cwd.rstrip("/") + "/" + path
+        parts = []
+        for part in path.split("/"):
+            if part == "..":
+                if parts:
+                    parts.pop()
+            elif part and part != ".":
+                parts.append(part)
+        return os.path.join(self.root, *parts)
+
+    def open(self, file, mode="r", *args, **kwargs):
+        self.counts["open"] += 1
+        if "b" not in mode:
+            kwargs.setdefault("encoding", "utf-8")
+        return builtins.open(self.path(file), mode, *args, **kwargs)
+
+    # ---- time and buttons ----
+
+    def mktime(self, t):
+        return calendar.timegm(tuple(t[:6]) + (0, 0, 0))
+
+    def ticks(self):
+        return time.monotonic() - self.started + self.slept
+
+    def now(self):
+        return self.epoch + self.ticks()
+
+    def localtime(self):
+        t = time.gmtime(self.now())
+        return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec, t.tm_wday, t.tm_yday)
+
+    def set_time(self, t):
+        self.epoch = self.mktime(t) - self.ticks()
+
+    def advance(self, seconds):
+        """Time spent by the hardware, such as joining a network."""
+        self.slept += seconds
+
+    def sleep(self, seconds):
+        self.counts["sleep"] += 1
+        self.slept += seconds
+        if seconds >= 1 and not self.in_irq:
+            self.wait()
+
+    def wait(self):
+        """A long sleep: deliver the next press to any interrupt handlers, or end the run."""
+        if self.events and self.irqs:
+            self._press(self.events.popleft())
+            self.in_irq = True
+            try:
+                for pin in sorted(self.held):
+                    if pin in self.irqs:
+                        owner, handler = self.irqs[pin]
+                        handler(owner)
+            finally:
+                self.in_irq = False
+        elif self.idle > 0:
+            self.idle -= 1
+        else:
+            raise Halted()
+
+    def halt(self):
+        """Badger2040.halt() on USB power: wait for the next press."""
+        self.counts["halt"] += 1
+        if not self.events:
+            raise Halted()
+        self._press(self.events.popleft())
+
+    def _press(self, buttons):
+        self.held = buttons
+        self.released_at = self.slept + PRESS_S
+
+    def is_held(self, button):
+        return button in self.held and self.slept < self.released_at
+
+    # ---- network ----
+
+    def online(self):
+        return any(w["status"] == 3 for w in self.wlans.values())
+
+    def route(self, url):
+        for prefix, response in self.routes:
+            if url.startswith(prefix):
+                if callable(response):
+                    response = response(url)
+                status, body = response if isinstance(response, tuple) else (200, response)
+                return status, body.encode() if isinstance(body, str) else bytes(body)
+        return None
+
+    # ---- display ----
+
+    def new_display(self):
+        display = graphics.PicoGraphics(self.counts)
+        display.on_update = self._refresh
+        self.displays.append(display)
+        self.display = display
+        return display
+
+    def draw_grey(self, display, rows, x, y):
+        pen = display.pen
+        for j, row in enumerate(rows):
+            for i, grey in enumerate(row):
+                display._plot(x + i, y + j, grey * 15 // 255)
+        display.pen = pen
+
+    def _refresh(self, display, region):
+        if region is None:
+            self.panel[:] = display.pens
+        else:
+            x, y, w, h = region
+            x0, x1 = max(0, x), min(graphics.WIDTH, x + w)
+            for row in range(max(0, y), min(graphics.HEIGHT, y + h)):
+                start = row * graphics.WIDTH
+                self.panel[start + x0:start + x1] = display.pens[start + x0:start + x1]
+        if self.keep_frames:
+            self.frames.append(bytes(self.panel))
+
+    def save_pgm(self, path, frame=None):
+        frame = self.panel if frame is None else frame
+        with builtins.open(path, "wb") as f:
+            f.write(b"P5 %d %d 255\n" % (graphics.WIDTH, graphics.HEIGHT))
+            f.write(bytes(p * 17 for p in frame))
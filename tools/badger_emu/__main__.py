@@ -0,0 +1,61 @@
+"""Run an app in the emulator and report what it drew.
+
+    python3 tools/badger_emu examples/ebook.py --press down --press down --save ebook.pgm
+
+By default the app runs in a scratch copy of the repo, so its /state writes do not touch the tree.
+"""
+import argparse
+import json
+import os
+import sys
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    __package__ = "badger_emu"
+
+from badger_emu import Emulator, scratch_root, write_wifi_config  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("app", help="app to run, relative to the root, e.g. examples/ebook.py")
+    parser.add_argument("--root", help="use this directory as the badge filesystem instead of a scratch copy of the repo")
+    parser.add_argument("--press", action="append", default=[], help="a press, e.g. down or a+c, in order")
+    parser.add_argument("--battery", action="store_true", help="run on battery, so every halt powers off")
+    parser.add_argument("--voltage", type=float, default=3.9, help="battery voltage (default 3.9)")
+    parser.add_argument("--wifi", action="append", default=[], metavar="SSID:PSK[:RSSI]",
+                        help="an access point to offer, with its signal strength in dBm; the first is also written to WIFI_CONFIG.py")
+    parser.add_argument("--route", action="append", default=[], metavar="PREFIX=FILE",
+                        help="answer requests for URLs starting with PREFIX with FILE")
+    parser.add_argument("--idle", type=int, default=0, help="long sleeps or RTC wakes allowed once the presses run out")
+    parser.add_argument("--save", metavar="PGM", help="save the final panel image")
+    parser.add_argument("--quiet", action="store_true", help="do not echo the app's output")
+    args = parser.parse_args(argv)
+
+    root = args.root or scratch_root()
+    networks = []
+    for wifi in args.wifi:
+        ssid, _, psk = wifi.partition(":")
+        ap = {"ssid": ssid, "psk": psk}
+        if psk.count(":"):
+            psk, _, rssi = psk.rpartition(":")
+            ap.update(psk=psk, rssi=int(rssi))
+        if not networks:
+            write_wifi_config(root, ssid, psk)
+        networks.append(ap)
+    routes = {}
+    for route in args.route:
+        prefix, _, path = route.partition("=")
+        with open(path, "rb") as f:
+            routes[prefix] = f.read()
+
+    emu = Emulator(root, presses=args.press, usb=not args.battery, battery=args.voltage,
+                   networks=networks, routes=routes, idle=args.idle, verbose=not args.quiet)
+    emu.run(args.app)
+    if args.save:
+        emu.save_pgm(args.save)
+    print(json.dumps({"root": root, "boots": emu.boots, "counts": dict(sorted(emu.counts.items()))}, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# asyncio stand-in: CPython's asyncio, with MicroPython's extras. Stream connections are
+# answered from the emulator's routes when the request sent on them matches one, as urequests'
+# are, and otherwise go out over a real socket.
+from asyncio import *  # noqa F403
+import asyncio as _asyncio
+import io
+
+
+async def sleep_ms(ms):
+    await _asyncio.sleep(ms / 1000)
+
+
+class _Connection:
+    """Both ends of a stream connection, which is only made once the request has been sent."""
+
+    def __init__(self, host, port, ssl):
+        self.host = host
+        self.port = port
+        self.ssl = ssl
+        self.request = bytearray()
+        self.canned = None
+        self.reader = None
+        self.writer = None
+
+    def write(self, data):
+        if self.writer is not None:
+            self.writer.write(data)
+        else:
+            self.request += data
+
+    async def drain(self):
+        if self.writer is not None:
+            await self.writer.drain()
+
+    async def _connect(self):
+        if self.canned is not None or self.reader is not None:
+            return
+        path = bytes(self.request).split(b"\r\n", 1)[0].split(b" ")[1].decode() if self.request else "/"
+        default = 443 if self.ssl else 80
+        url = "{}://{}{}{}".format("https" if self.ssl else "http", self.host,
+                                   "" if self.port == default else ":{}".format(self.port), path)
+        route = emu.route(url)
+        if route is not None:
+            status, body = route
+            emu.counts["http_bytes"] += len(body)
+            self.canned = io.BytesIO(b"HTTP/1.0 %d OK\r\n\r\n" % status + body)
+            return
+        self.reader, self.writer = await _asyncio.open_connection(self.host, self.port, ssl=self.ssl or None)
+        self.writer.write(bytes(self.request))
+        await self.writer.drain()
+
+    async def readline(self):
+        await self._connect()
+        if self.canned is not None:
+            return self.canned.readline()
+        return await self.reader.readline()
+
+    async def read(self, n=-1):
+        await self._connect()
+        if self.canned is not None:
+            return self.canned.read(n)
+        return await self.reader.read(n)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    async def wait_closed(self):
+        if self.writer is not None:
+            await self.writer.wait_closed()
+
+
+async def open_connection(host, port, ssl=None):
+    emu.counts["http"] += 1
+    if not emu.online():
+        raise OSError(-2, "no network")
+    connection = _Connection(host, port, ssl)
+    return connection, connection
@@ -0,0 +1,189 @@
+# badger2040 stand-in, following the Badger 2040 W firmware module.
+# halt() takes the next scripted press on USB power, or powers off on battery, in which case
+# the emulator reboots the app with that press as the wake button.
+machine = emu.import_module("machine")
+print = emu.print
+
+BUTTON_DOWN = 11
+BUTTON_A = 12
+BUTTON_B = 13
+BUTTON_C = 14
+BUTTON_UP = 15
+BUTTON_USER = None
+BUTTON_MASK = 0b11111 << 11
+
+SYSTEM_VERY_SLOW = 0
+SYSTEM_SLOW = 1
+SYSTEM_NORMAL = 2
+SYSTEM_FAST = 3
+SYSTEM_TURBO = 4
+
+UPDATE_NORMAL = 0
+UPDATE_MEDIUM = 1
+UPDATE_FAST = 2
+UPDATE_TURBO = 3
+
+RTC_ALARM = 8
+LED = 22
+ENABLE_3V3 = 10
+BUSY = 26
+
+WIDTH = 296
+HEIGHT = 128
+
+BUTTONS = {
+    BUTTON_DOWN: machine.Pin(BUTTON_DOWN, machine.Pin.IN, machine.Pin.PULL_DOWN),
+    BUTTON_A: machine.Pin(BUTTON_A, machine.Pin.IN, machine.Pin.PULL_DOWN),
+    BUTTON_B: machine.Pin(BUTTON_B, machine.Pin.IN, machine.Pin.PULL_DOWN),
+    BUTTON_C: machine.Pin(BUTTON_C, machine.Pin.IN, machine.Pin.PULL_DOWN),
+    BUTTON_UP: machine.Pin(BUTTON_UP, machine.Pin.IN, machine.Pin.PULL_DOWN),
+}
+
+
+def is_wireless():
+    return True
+
+
+def woken_by_rtc():
+    return emu.woken_by_rtc
+
+
+def woken_by_button():
+    return bool(emu.wake)
+
+
+def pressed_to_wake(button):
+    return button in emu.wake
+
+
+def reset_pressed_to_wake():
+    emu.wake = frozenset()
+
+
+def pressed_to_wake_get_once(button):
+    if button in emu.wake:
+        emu.wake = emu.wake - {button}
+        return True
+    return False
+
+
+def system_speed(speed):
+    pass
+
+
+def turn_on():
+    pass
+
+
+def turn_off():
+    emu.counts["turn_off"] += 1
+    if not emu.usb:
+        raise emu.PowerOff()
+
+
+def sleep_for(minutes=None):
+    emu.counts["sleep_for"] += 1
+    if not emu.usb:
+        raise emu.PowerOff(minutes)
+    # On USB power the badge stays on, so the firmware waits out the alarm and then resets
+    if minutes is not None:
+        emu.sleep(minutes * 60)
+    raise emu.Reset()
+
+
+def pico_rtc_to_pcf():
+    pass
+
+
+def pcf_to_pico_rtc():
+    pass
+
+
+class Badger2040():
+    def __init__(self):
+        self.display = emu.new_display()
+        self._led = 0
+
+    def __getattr__(self, item):
+        return getattr(self.display, item)
+
+    def update(self):
+        self.display.update()
+
+    def partial_update(self, x, y, w, h):
+        self.display.partial_update(x, y, w, h)
+
+    def set_update_speed(self, speed):
+        self.display.set_update_speed(speed)
+
+    def led(self, brightness):
+        self._led = brightness
+
+    def invert(self, invert):
+        pass
+
+    def thickness(self, thickness):
+        self.display.set_thickness(thickness)
+
+    def image(self, data, w, h, x, y):
+        emu.counts["image"] += 1
+        for oy in range(h):
+            row = data[oy]
+            for ox in range(w):
+                if row & 0b1 == 0:
+                    self.display.pixel(x + ox, y + oy)
+                row >>= 1
+
+    def pressed(self, button):
+        return BUTTONS[button].value() == 1 or pressed_to_wake_get_once(button)
+
+    def pressed_any(self):
+        for button in BUTTONS.values():
+            if button.value():
+                return True
+        return False
+
+    def keepalive(self):
+        pass
+
+    def halt(self):
+        turn_off()
+        emu.halt()
+
+    def connect(self, **args):
+        wifi_config = emu.import_module("WIFI_CONFIG")
+        if wifi_config is None:
+            raise ImportError("no module named 'WIFI_CONFIG'")
+        status_handler = args.get("status_handler", self.status_handler)
+        if wifi_config.COUNTRY == "":
+            raise RuntimeError("You must populate WIFI_CONFIG.py for networking.")
+        self.display.set_update_speed(2)
+        network = emu.import_module("network")
+        wlan = network.WLAN(network.STA_IF)
+        wlan.active(True)
+        if status_handler:
+            status_handler("STA", False, "")
+        wlan.connect(wifi_config.SSID, wifi_config.PSK)
+        if status_handler and wlan.isconnected():
+            status_handler("STA", True, wlan.ifconfig()[0])
+
+    def status_handler(self, mode, status, ip):
+        self.display.set_update_speed(2)
+        print(mode, status, ip)
+        self.display.set_pen(15)
+        self.display.clear()
+        self.display.set_pen(0)
+        if status:
+            self.display.text("Connected!", 10, 10, 300, 0.5)
+            self.display.text(ip, 10, 30, 300, 0.5)
+        else:
+            self.display.text("Connecting...", 10, 10, 300, 0.5)
+        self.display.update()
+
+    def isconnected(self):
+        network = emu.import_module("network")
+        return network.WLAN(network.STA_IF).isconnected()
+
+    def ip_address(self):
+        network = emu.import_module("network")
+        return network.WLAN(network.STA_IF).ifconfig()[0]
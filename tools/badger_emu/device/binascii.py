@@ -0,0 +1,13 @@
+# binascii stand-in. MicroPython's crc32 also takes a str.
+import binascii as _binascii
+
+hexlify = _binascii.hexlify
+unhexlify = _binascii.unhexlify
+a2b_base64 = _binascii.a2b_base64
+b2a_base64 = _binascii.b2a_base64
+
+
+def crc32(data, value=0):
+    if isinstance(data, str):
+        data = data.encode()
+    return _binascii.crc32(data, value)
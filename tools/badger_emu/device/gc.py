@@ -0,0 +1,37 @@
+# gc stand-in. mem_alloc() is the Python heap in use while tracemalloc is tracing, and the
+# free figure is what would be left of the Pico W's heap.
+import gc as _gc
+import tracemalloc
+
+HEAP = 166 * 1024
+
+
+def collect():
+    emu.counts["gc"] += 1
+    _gc.collect()
+
+
+def mem_alloc():
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return 0
+
+
+def mem_free():
+    return max(0, HEAP - mem_alloc())
+
+
+def enable():
+    pass
+
+
+def disable():
+    pass
+
+
+def isenabled():
+    return True
+
+
+def threshold(amount=None):
+    return -1 if amount is None else None
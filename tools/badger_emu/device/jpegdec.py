@@ -0,0 +1,36 @@
+# jpegdec stand-in. Sizes are read from the file, but the picture is a stable pattern (see images.py).
+# The firmware's values, which are JPEGDEC option flags rather than shift counts
+JPEG_SCALE_FULL = 0
+JPEG_SCALE_HALF = 2
+JPEG_SCALE_QUARTER = 4
+JPEG_SCALE_EIGHTH = 8
+
+_SHIFTS = {JPEG_SCALE_FULL: 0, JPEG_SCALE_HALF: 1, JPEG_SCALE_QUARTER: 2, JPEG_SCALE_EIGHTH: 3}
+
+
+class JPEG:
+    def __init__(self, framebuffer):
+        self.framebuffer = framebuffer
+        self.data = None
+
+    # badge.py passes a name straight from readline(), newline and all, which the badge accepts
+    def open_file(self, filename):
+        with emu.open(filename.strip(), "rb") as f:
+            self.data = f.read()
+        self.width, self.height = emu.images.jpeg_size(self.data)
+
+    def open_RAM(self, data):
+        self.data = bytes(data)
+        self.width, self.height = emu.images.jpeg_size(self.data)
+
+    def get_width(self):
+        return self.width
+
+    def get_height(self):
+        return self.height
+
+    def decode(self, x=0, y=0, scale=JPEG_SCALE_FULL, dither=True):
+        emu.counts["jpeg_decode"] += 1
+        shift = _SHIFTS[scale]
+        rows = emu.images.jpeg_pattern(self.data, self.width >> shift, self.height >> shift)
+        emu.draw_grey(self.framebuffer, rows, x, y)
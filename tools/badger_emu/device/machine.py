@@ -0,0 +1,104 @@
+# machine stand-in. Buttons read the emulator's scripted presses, the USB detect pin follows
+# the power source, and ADC 29 reads the configured battery voltage.
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self._value = value or 0
+
+    def value(self, v=None):
+        if v is not None:
+            self._value = int(bool(v))
+            return None
+        if self.id == "WL_GPIO2":
+            return int(emu.usb)
+        if self.id in emu.BUTTON_PINS:
+            return int(emu.is_held(self.id))
+        return self._value
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+    def irq(self, trigger=None, handler=None):
+        if handler is None:
+            emu.irqs.pop(self.id, None)
+        else:
+            emu.irqs[self.id] = (self, handler)
+
+    def __repr__(self):
+        return "Pin({})".format(self.id)
+
+
+class ADC:
+    def __init__(self, pin):
+        self.pin = getattr(pin, "id", pin)
+
+    def read_u16(self):
+        emu.counts["adc"] += 1
+        if self.pin in (29, 3):
+            return int(emu.battery * emu.ADC_PER_VOLT)
+        return 0
+
+
+class RTC:
+    def datetime(self, t=None):
+        if t is None:
+            year, month, day, hour, minute, second, weekday, _ = emu.localtime()
+            return (year, month, day, weekday, hour, minute, second, 0)
+        year, month, day, _, hour, minute, second, _ = t
+        emu.set_time((year, month, day, hour, minute, second, 0, 0))
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def init(self, *args, **kwargs):
+        pass
+
+    def deinit(self):
+        pass
+
+
+class I2C:
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+def reset():
+    raise emu.Reset()
+
+
+def soft_reset():
+    raise emu.Reset()
+
+
+def freq(hz=None):
+    return 125_000_000 if hz is None else None
+
+
+def unique_id():
+    return b"\xe6\x61\x41\x04\x03\x2b\x2c\x2f"
+
+
+def lightsleep(ms=None):
+    emu.sleep((ms or 0) / 1000)
+
+
+def deepsleep(ms=None):
+    raise emu.PowerOff()
@@ -0,0 +1,26 @@
+# micropython stand-in
+def const(value):
+    return value
+
+
+def native(f):
+    return f
+
+
+viper = native
+
+
+def mem_info(verbose=None):
+    pass
+
+
+def opt_level(level=None):
+    return 0
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def schedule(function, arg):
+    function(arg)
@@ -0,0 +1,104 @@
+# network stand-in. The access points come from the emulator: connecting to one that is
+# listed, with its password, gets the emulator's DHCP lease, or the static one set with
+# ifconfig(). Connecting costs ASSOCIATE_S of emulated time, plus DHCP_S without a static lease.
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_WRONG_PASSWORD = -3
+STAT_NO_AP_FOUND = -2
+STAT_CONNECT_FAIL = -1
+STAT_GOT_IP = 3
+
+ASSOCIATE_S = 0.8
+DHCP_S = 1.5
+
+
+def country(code=None):
+    return "GB" if code is None else None
+
+
+def hostname(name=None):
+    return "PicoW" if name is None else None
+
+
+class WLAN:
+    def __init__(self, interface=STA_IF):
+        self.state = emu.wlans.setdefault(interface, {
+            "active": False, "status": STAT_IDLE, "ssid": None, "static": None, "lease": None, "config": {}
+        })
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self.state["active"]
+        self.state["active"] = bool(is_active)
+        if not is_active:
+            self.disconnect()
+
+    def scan(self):
+        emu.counts["wifi_scan"] += 1
+        emu.advance(1.5)
+        return [(
+            ap["ssid"].encode(), ap["bssid"], ap["channel"], ap["rssi"], 3, 0
+        ) for ap in emu.networks]
+
+    def connect(self, ssid=None, key=None, bssid=None, **kwargs):
+        emu.counts["wifi_connect"] += 1
+        self.state["status"] = STAT_NO_AP_FOUND
+        for ap in emu.networks:
+            if ap["ssid"] != ssid or (bssid is not None and bytes(bssid) != ap["bssid"]):
+                continue
+            emu.advance(ASSOCIATE_S)
+            if ap["psk"] != key:
+                self.state["status"] = STAT_WRONG_PASSWORD
+                return
+            if self.state["static"] is None:
+                emu.advance(DHCP_S)
+                self.state["lease"] = emu.lease
+            else:
+                self.state["lease"] = self.state["static"]
+            self.state["ssid"] = ssid
+            self.state["bssid"] = ap["bssid"]
+            self.state["channel"] = ap["channel"]
+            self.state["status"] = STAT_GOT_IP
+            return
+
+    def disconnect(self):
+        self.state["status"] = STAT_IDLE
+        self.state["ssid"] = None
+        self.state["lease"] = None
+
+    def isconnected(self):
+        return self.state["status"] == STAT_GOT_IP
+
+    def status(self, param=None):
+        if param == "rssi":
+            for ap in emu.networks:
+                if ap["ssid"] == self.state["ssid"]:
+                    return ap["rssi"]
+            return 0
+        return self.state["status"]
+
+    def ifconfig(self, config=None):
+        if config is None:
+            return self.state["lease"] or ("0.0.0.0", "0.0.0.0", "0.0.0.0", "0.0.0.0")
+        if config == "dhcp":
+            self.state["static"] = None
+        else:
+            self.state["static"] = tuple(config)
+            if self.isconnected():
+                self.state["lease"] = self.state["static"]
+
+    def config(self, *args, **kwargs):
+        if kwargs:
+            self.state["config"].update(kwargs)
+            return None
+        key = args[0]
+        if key == "ssid":
+            return self.state["ssid"]
+        if key == "mac":
+            return b"\x28\xcd\xc1\x00\x00\x01"
+        if key == "channel":
+            return self.state.get("channel", 0)
+        return self.state["config"].get(key)
@@ -0,0 +1,78 @@
+# os stand-in, with every path mapped into the emulator's filesystem root.
+import os as _os
+
+sep = "/"
+
+# LittleFS on the badge: 4K blocks, 848K for files
+BLOCK_SIZE = 4096
+BLOCKS = 212
+
+
+def _path(path):
+    emu.counts["fs"] += 1
+    return emu.path(path)
+
+
+def listdir(path=""):
+    return sorted(_os.listdir(_path(path)))
+
+
+def ilistdir(path=""):
+    for entry in _os.scandir(_path(path)):
+        if entry.is_dir():
+            yield (entry.name, 0x4000, 0, 0)
+        else:
+            yield (entry.name, 0x8000, 0, entry.stat().st_size)
+
+
+def stat(path):
+    s = _os.stat(_path(path))
+    mode = 0x4000 if _os.path.isdir(_path(path)) else 0x8000
+    return (mode, 0, 0, 0, 0, 0, s.st_size, int(s.st_mtime), int(s.st_mtime), int(s.st_mtime))
+
+
+def statvfs(path):
+    used = 0
+    for folder, _, files in _os.walk(emu.root):
+        for name in files:
+            used += (_os.path.getsize(_os.path.join(folder, name)) + BLOCK_SIZE - 1) // BLOCK_SIZE
+    free = max(0, BLOCKS - used)
+    return (BLOCK_SIZE, BLOCK_SIZE, BLOCKS, free, free, 0, 0, 0, 0, 255)
+
+
+def mkdir(path):
+    _os.mkdir(_path(path))
+
+
+def rmdir(path):
+    _os.rmdir(_path(path))
+
+
+def remove(path):
+    _os.remove(_path(path))
+
+
+def rename(old, new):
+    _os.replace(_path(old), _path(new))
+
+
+def getcwd():
+    return emu.cwd
+
+
+def chdir(path):
+    if not _os.path.isdir(_path(path)):
+        raise OSError(2, "ENOENT")
+    emu.cwd = path if path.startswith("/") else (emu.cwd.rstrip("/") + "/" + path)
+
+
+def sync():
+    pass
+
+
+def urandom(n):
+    return _os.urandom(n)
+
+
+def uname():
+    return ("rp2", "rp2", "1.22.0", "v1.22.0", "Raspberry Pi Pico W with RP2040")
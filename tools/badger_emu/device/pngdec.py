@@ -0,0 +1,34 @@
+# pngdec stand-in, decoding for real and drawing grey levels as dithered pens.
+PNG_POSTERISE = 0
+PNG_DITHER = 1
+PNG_COPY = 2
+
+
+class PNG:
+    def __init__(self, framebuffer):
+        self.framebuffer = framebuffer
+        self.image = None
+
+    # badge.py passes a name straight from readline(), newline and all, which the badge accepts
+    def open_file(self, filename):
+        with emu.open(filename.strip(), "rb") as f:
+            self.image = emu.images.png_decode(f.read())
+
+    def open_RAM(self, data):
+        self.image = emu.images.png_decode(bytes(data))
+
+    def get_width(self):
+        return self.image[0]
+
+    def get_height(self):
+        return self.image[1]
+
+    def decode(self, x=0, y=0, scale=1, mode=PNG_POSTERISE, palette_offset=0, source=None, rotate=0):
+        emu.counts["png_decode"] += 1
+        rows = self.image[2]
+        if source is not None:
+            sx, sy, sw, sh = source
+            rows = [row[sx:sx + sw] for row in rows[sy:sy + sh]]
+        if scale > 1:
+            rows = [[p for p in row for _ in range(scale)] for row in rows for _ in range(scale)]
+        emu.draw_grey(self.framebuffer, rows, x, y)
@@ -0,0 +1,37 @@
+# qrcode stand-in. The matrix has the right size for the text (version 1-10, low error
+# correction) and real finder patterns, but its data modules are a stable pattern, not a
+# scannable code.
+import zlib
+
+CAPACITY = (17, 32, 53, 78, 106, 134, 154, 192, 230, 271)
+
+
+class QRCode:
+    def __init__(self):
+        self.set_text("")
+
+    def set_text(self, text):
+        self.text = text
+        data = text.encode() if isinstance(text, str) else bytes(text)
+        version = 1
+        while version < len(CAPACITY) and len(data) > CAPACITY[version - 1]:
+            version += 1
+        self.size = 17 + 4 * version
+        self.seed = zlib.crc32(data)
+
+    def get_size(self):
+        return self.size, self.size
+
+    # Like qrcodegen, anything outside the code is light
+    def get_module(self, x, y):
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            return False
+        for fx, fy in ((0, 0), (self.size - 7, 0), (0, self.size - 7)):
+            if fx - 1 <= x <= fx + 7 and fy - 1 <= y <= fy + 7:
+                dx, dy = x - fx, y - fy
+                if dx in (-1, 7) or dy in (-1, 7):
+                    return False
+                return max(abs(dx - 3), abs(dy - 3)) != 2
+        if x == 6 or y == 6:
+            return (x + y) % 2 == 0
+        return bool((zlib.crc32(bytes((x, y)), self.seed) >> 3) & 1)
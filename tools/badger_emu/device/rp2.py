@@ -0,0 +1,3 @@
+# rp2 stand-in
+def country(code=None):
+    return "GB" if code is None else None
@@ -0,0 +1,57 @@
+# time stand-in on the emulator's clock: real time spent running plus any time slept, which
+# is skipped rather than waited. Ticks wrap at 2**30 like MicroPython's.
+import time as _time
+
+TICKS_PERIOD = 1 << 30
+
+
+def time():
+    return int(emu.now())
+
+
+def time_ns():
+    return int(emu.now() * 1_000_000_000)
+
+
+def sleep(seconds):
+    emu.sleep(seconds)
+
+
+def sleep_ms(ms):
+    emu.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    emu.sleep(us / 1_000_000)
+
+
+def ticks_ms():
+    return int(emu.ticks() * 1000) % TICKS_PERIOD
+
+
+def ticks_us():
+    return int(emu.ticks() * 1_000_000) % TICKS_PERIOD
+
+
+def ticks_cpu():
+    return ticks_us()
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) % TICKS_PERIOD
+
+
+def ticks_diff(end, start):
+    return ((end - start + TICKS_PERIOD // 2) % TICKS_PERIOD) - TICKS_PERIOD // 2
+
+
+def gmtime(secs=None):
+    t = _time.gmtime(emu.now() if secs is None else secs)
+    return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec, t.tm_wday, t.tm_yday)
+
+
+localtime = gmtime
+
+
+def mktime(t):
+    return emu.mktime(t)
@@ -0,0 +1,6 @@
+# uasyncio is the old name for asyncio
+from asyncio import *  # noqa F403
+
+_asyncio = emu.import_module("asyncio")
+sleep_ms = _asyncio.sleep_ms
+open_connection = _asyncio.open_connection
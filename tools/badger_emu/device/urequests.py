@@ -0,0 +1,80 @@
+# urequests stand-in. URLs matching one of the emulator's routes get its canned response,
+# anything else is fetched for real. Either way the body is available as a stream on .raw.
+import io
+import json as _json
+import urllib.error
+import urllib.request
+
+
+class Response:
+    def __init__(self, status_code, body, headers=None):
+        self.status_code = status_code
+        self.reason = b"OK" if status_code == 200 else b""
+        self.headers = headers or {}
+        self.encoding = "utf-8"
+        self.raw = io.BytesIO(body)
+        self._cached = None
+
+    def close(self):
+        self.raw.close()
+
+    @property
+    def content(self):
+        if self._cached is None:
+            self._cached = self.raw.read()
+        return self._cached
+
+    @property
+    def text(self):
+        return str(self.content, self.encoding)
+
+    def json(self):
+        return _json.loads(self.content)
+
+
+def request(method, url, data=None, json=None, headers={}, stream=None, auth=None, timeout=None, parse_headers=True):
+    emu.counts["http"] += 1
+    if not emu.online():
+        raise OSError(-2, "no network")
+    if json is not None:
+        data = _json.dumps(json).encode()
+    route = emu.route(url)
+    if route is not None:
+        status, body = route
+        emu.counts["http_bytes"] += len(body)
+        return Response(status, body)
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers, method=method), timeout=timeout) as r:
+            body = r.read()
+            status = r.status
+    except urllib.error.HTTPError as e:
+        body = e.read()
+        status = e.code
+    except urllib.error.URLError as e:
+        raise OSError(-2, str(e.reason))
+    emu.counts["http_bytes"] += len(body)
+    return Response(status, body)
+
+
+def head(url, **kw):
+    return request("HEAD", url, **kw)
+
+
+def get(url, **kw):
+    return request("GET", url, **kw)
+
+
+def post(url, **kw):
+    return request("POST", url, **kw)
+
+
+def put(url, **kw):
+    return request("PUT", url, **kw)
+
+
+def patch(url, **kw):
+    return request("PATCH", url, **kw)
+
+
+def delete(url, **kw):
+    return request("DELETE", url, **kw)
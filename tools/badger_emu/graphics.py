@@ -0,0 +1,221 @@
+# A stand-in for PicoGraphics as set up on Badger 2040 W: 296x128, 16 pens dithered down to 1 bit.
+#
+# Every pixel's pen (0-15) is kept in `pens`, which is what frames are compared on. The object
+# itself is the 1-bit framebuffer in the device's layout (columns of HEIGHT // 8 bytes, top pixel
+# in the high bit), so code that reads memoryview(display.display) sees what it would on the badge.
+#
+# Text uses made-up glyphs with plausible widths: they are stable, so two renders of the same
+# text match pixel for pixel, but they are not the firmware's fonts.
+import zlib
+from collections import Counter
+
+WIDTH = 296
+HEIGHT = 128
+
+# 4x4 ordered dither thresholds, as the 1-bit pens are dithered on the badge
+BAYER = (
+    (0, 8, 2, 10),
+    (12, 4, 14, 6),
+    (3, 11, 1, 9),
+    (15, 7, 13, 5),
+)
+
+BITMAP_FONTS = {"bitmap6": (5, 6), "bitmap8": (6, 8), "bitmap14_outline": (10, 14)}
+HERSHEY_FONTS = {"sans": 1.0, "gothic": 1.05, "cursive": 0.95, "serif": 1.0, "serif_italic": 1.0}
+
+NARROW = set("il.,;:'!|`")
+WIDE = set("mwMW@%")
+
+
+def hershey_advance(c):
+    if c == " ":
+        return 11
+    if c in NARROW:
+        return 8
+    if c in WIDE:
+        return 24
+    if c.isupper() or c.isdigit():
+        return 19
+    return 16
+
+
+class PicoGraphics(bytearray):
+    def __init__(self, counts=None):
+        super().__init__(WIDTH * (HEIGHT // 8))
+        self.pens = bytearray(WIDTH * HEIGHT)
+        self.pen = 0
+        self.font = "bitmap8"
+        self.thickness = 1
+        self.clip = (0, 0, WIDTH, HEIGHT)
+        self.counts = counts if counts is not None else Counter()
+        self.on_update = None
+
+    # ---- pixels ----
+
+    def _plot(self, x, y, pen):
+        cx, cy, cw, ch = self.clip
+        if cx <= x < cx + cw and cy <= y < cy + ch:
+            self.pens[y * WIDTH + x] = pen
+            index = x * (HEIGHT // 8) + (y >> 3)
+            bit = 1 << (7 - (y & 7))
+            if pen * 17 > BAYER[y & 3][x & 3] * 16 + 8:
+                self[index] |= bit
+            else:
+                self[index] &= ~bit & 0xFF
+
+    def _span(self, x, y, length):
+        for i in range(length):
+            self._plot(x + i, y, self.pen)
+
+    def _fill(self, x, y, w, h):
+        for row in range(y, y + h):
+            self._span(x, row, w)
+
+    # ---- state ----
+
+    def set_pen(self, pen):
+        self.counts["set_pen"] += 1
+        self.pen = max(0, min(15, int(pen)))
+
+    def create_pen(self, r, g, b):
+        return (r * 299 + g * 587 + b * 114) // 1000 // 17
+
+    def set_font(self, font):
+        self.counts["set_font"] += 1
+        self.font = font
+
+    def set_thickness(self, thickness):
+        self.thickness = thickness
+
+    def get_bounds(self):
+        return WIDTH, HEIGHT
+
+    def set_clip(self, x, y, w, h):
+        self.clip = (x, y, w, h)
+
+    def remove_clip(self):
+        self.clip = (0, 0, WIDTH, HEIGHT)
+
+    # ---- primitives ----
+
+    def clear(self):
+        self.counts["clear"] += 1
+        self._fill(*self.clip)
+
+    def pixel(self, x, y):
+        self.counts["pixel"] += 1
+        self._plot(int(x), int(y), self.pen)
+
+    def pixel_span(self, x, y, length):
+        self.counts["pixel_span"] += 1
+        self._span(int(x), int(y), int(length))
+
+    def rectangle(self, x, y, w, h):
+        self.counts["rectangle"] += 1
+        self._fill(int(x), int(y), int(w), int(h))
+
+    def circle(self, x, y, r):
+        self.counts["circle"] += 1
+        for dy in range(-r, r + 1):
+            dx = int((r * r - dy * dy) ** 0.5)
+            self._span(x - dx, y + dy, dx * 2 + 1)
+
+    def line(self, x1, y1, x2, y2, thickness=None):
+        self.counts["line"] += 1
+        self._line(int(x1), int(y1), int(x2), int(y2), thickness or 1)
+
+    def _line(self, x1, y1, x2, y2, thickness):
+        dx, dy = abs(x2 - x1), -abs(y2 - y1)
+        sx, sy = (1 if x1 < x2 else -1), (1 if y1 < y2 else -1)
+        err = dx + dy
+        half = thickness // 2
+        while True:
+            if thickness > 1:
+                self._fill(x1 - half, y1 - half, thickness, thickness)
+            else:
+                self._plot(x1, y1, self.pen)
+            if x1 == x2 and y1 == y2:
+                return
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x1 += sx
+            if e2 <= dx:
+                err += dx
+                y1 += sy
+
+    def triangle(self, x1, y1, x2, y2, x3, y3):
+        self.counts["triangle"] += 1
+        self.polygon([(x1, y1), (x2, y2), (x3, y3)])
+
+    def polygon(self, points):
+        self.counts["polygon"] += 1
+        points = list(points)
+        for i in range(len(points)):
+            (x1, y1), (x2, y2) = points[i], points[(i + 1) % len(points)]
+            self._line(int(x1), int(y1), int(x2), int(y2), 1)
+
+    # ---- text ----
+
+    def _advances(self, text, scale, spacing):
+        if self.font in BITMAP_FONTS:
+            width = BITMAP_FONTS[self.font][0]
+            return [(width + spacing) * max(1, int(scale)) for _ in text]
+        factor = HERSHEY_FONTS.get(self.font, 1.0)
+        # The firmware truncates each glyph's advance, not the total
+        return [int(hershey_advance(c) * factor * scale) for c in text]
+
+    def measure_text(self, text, scale=2.0, spacing=1, fixed_width=False):
+        self.counts["measure_text"] += 1
+        return sum(self._advances(str(text), scale, spacing))
+
+    def text(self, text, x, y, wordwrap=-1, scale=2.0, angle=0, spacing=1, fixed_width=False):
+        self.counts["text"] += 1
+        text = str(text)
+        x, y = int(x), int(y)
+        if self.font in BITMAP_FONTS:
+            height = BITMAP_FONTS[self.font][1] * max(1, int(scale))
+            top = y
+        else:
+            height = max(1, int(21 * scale))
+            top = y - height // 2
+        left = x
+        line_height = height + 2
+        for word in text.split(" "):
+            advances = self._advances(word + " ", scale, spacing)
+            if wordwrap is not None and wordwrap > 0 and x > left and x + sum(advances[:-1]) > left + wordwrap:
+                x = left
+                top += line_height
+            for c, advance in zip(word + " ", advances):
+                if c == "\n":
+                    x = left
+                    top += line_height
+                    continue
+                if c != " ":
+                    self._glyph(c, x, top, max(1, int(advance * 0.7)), height)
+                x += advance
+
+    def _glyph(self, c, x, y, w, h):
+        seed = zlib.crc32(c.encode()) | 1
+        x = int(x)
+        for j in range(h):
+            for i in range(w):
+                if (seed >> ((i * 3 + j * 5) % 31)) & 1:
+                    self._plot(x + i, y + j, self.pen)
+
+    # ---- panel ----
+
+    def update(self):
+        self.counts["update"] += 1
+        if self.on_update:
+            self.on_update(self, None)
+
+    def partial_update(self, x, y, w, h):
+        self.counts["partial_update"] += 1
+        if y % 8 or h % 8:
+            raise ValueError("partial_update y and h must be multiples of 8")
+        if self.on_update:
+            self.on_update(self, (x, y, w, h))
+
+    def set_update_speed(self, speed):
+        pass
@@ -0,0 +1,119 @@
+# Image decoding for the jpegdec and pngdec stand-ins.
+#
+# PNGs are decoded properly (any bit depth or colour type, no interlacing) and drawn as
+# dithered grey pens. JPEGs only have their size read: the image is drawn as a stable pattern
+# derived from the file's bytes, enough to time and compare renders without a JPEG decoder.
+import struct
+import zlib
+
+
+def jpeg_size(data):
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        if marker in (0xC0, 0xC1, 0xC2):
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    raise RuntimeError("not a JPEG")
+
+
+# Returns (width, height, rows) where rows are lists of 0-255 grey levels
+def png_decode(data):
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        raise RuntimeError("not a PNG")
+    pos = 8
+    idat = b""
+    palette = None
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        if kind == b"IHDR":
+            width, height, depth, colour, _, _, interlace = struct.unpack(">IIBBBBB", chunk)
+        elif kind == b"PLTE":
+            palette = [chunk[i:i + 3] for i in range(0, len(chunk), 3)]
+        elif kind == b"IDAT":
+            idat += chunk
+        pos += 12 + length
+    if interlace:
+        raise RuntimeError("interlaced PNGs are not supported")
+
+    channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}[colour]
+    bits = depth * channels
+    stride = (width * bits + 7) // 8
+    bpp = max(1, bits // 8)
+    raw = zlib.decompress(idat)
+    rows = []
+    previous = bytearray(stride)
+    for y in range(height):
+        start = y * (stride + 1)
+        kind = raw[start]
+        line = bytearray(raw[start + 1:start + 1 + stride])
+        for i in range(stride):
+            a = line[i - bpp] if i >= bpp else 0
+            b = previous[i]
+            c = previous[i - bpp] if i >= bpp else 0
+            if kind == 1:
+                line[i] = (line[i] + a) & 0xFF
+            elif kind == 2:
+                line[i] = (line[i] + b) & 0xFF
+            elif kind == 3:
+                line[i] = (line[i] + (a + b) // 2) & 0xFF
+            elif kind == 4:
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                line[i] = (line[i] + (a if pa <= pb and pa <= pc else b if pb <= pc else c)) & 0xFF
+        previous = line
+        rows.append([_grey(line, x, depth, colour, palette) for x in range(width)])
+    return width, height, rows
+
+
+def _sample(line, index, depth):
+    if depth == 8:
+        return line[index]
+    if depth == 16:
+        return line[index * 2]
+    per_byte = 8 // depth
+    byte = line[index // per_byte]
+    shift = 8 - depth * (index % per_byte + 1)
+    return ((byte >> shift) & ((1 << depth) - 1)) * 255 // ((1 << depth) - 1)
+
+
+def _grey(line, x, depth, colour, palette):
+    if colour == 0:
+        return _sample(line, x, depth)
+    if colour == 3:
+        per_byte = 8 // depth if depth < 8 else 1
+        index = line[x] if depth == 8 else (line[x // per_byte] >> (8 - depth * (x % per_byte + 1))) & ((1 << depth) - 1)
+        r, g, b = palette[index]
+        return (r * 299 + g * 587 + b * 114) // 1000
+    channels = {2: 3, 4: 2, 6: 4}[colour]
+    step = channels * (depth // 8)
+    values = line[x * step:(x + 1) * step:depth // 8]
+    if colour == 4:
+        grey, alpha = values
+        return 255 - (255 - grey) * alpha // 255
+    r, g, b = values[:3]
+    grey = (r * 299 + g * 587 + b * 114) // 1000
+    if colour == 6:
+        grey = 255 - (255 - grey) * values[3] // 255
+    return grey
+
+
+# A stable stand-in picture for a JPEG: a border and a pattern seeded from the file's contents
+def jpeg_pattern(data, width, height):
+    seed = zlib.crc32(data)
+    rows = []
+    for y in range(height):
+        row = []
+        for x in range(width):
+            if x == 0 or y == 0 or x == width - 1 or y == height - 1:
+                row.append(0)
+            else:
+                row.append(0 if (seed >> ((x // 4 + y // 4 * 3) % 31)) & 1 else 255)
+        rows.append(row)
+    return rows
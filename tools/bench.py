@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# Benchmarks every app's draw function in the emulator (tools/badger_emu).
+#
+# Each app is booted in a scratch copy of the repo until it first waits for a button,
+# then its draw function is called again and again. For each one this records the wall
+# time of the first call and of the repeats, the drawing primitives, decodes and panel
+# updates a call makes, and the peak Python allocation during a call. The results are
+# printed as JSON, tagged with the commit, so they can be compared from commit to commit.
+#
+#   python3 tools/bench.py -o bench.json
+#   python3 tools/bench.py --only ebook --repeat 20
+#
+# Times are PC times, so only compare results from the same machine. The counts hold anywhere.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from badger_emu import REPO, Emulator, scratch_root, write_wifi_config  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+WIFI = {"ssid": "bench", "psk": "badger2040"}
+ROUTES = {
+    "https://api.open-meteo.com/": "open-meteo-forecast.json",
+    "https://air-quality-api.open-meteo.com/": "open-meteo-air-quality.json",
+}
+
+
+def nothing(app):
+    pass
+
+
+def clear_page_cache(app):
+    app.page_cache.clear()
+
+
+# Forget the page on the display, so each call sends a whole new page rather than finding
+# nothing changed since the last one
+def forget_weather_frame(app):
+    app.state["drawn"] = None
+    try:
+        app.os.remove(app.FRAME_FILE)
+    except OSError:
+        pass
+
+
+# name: (app, function, arguments from the app's globals, run before each call)
+CASES = {
+    "launcher.render": ("launcher.py", "render", lambda app: ((), {"full": True}), nothing),
+    "ebook.render_page": ("examples/ebook.py", "render_page", lambda app: ((), {}), nothing),
+    "ebook.render_page.layout": ("examples/ebook.py", "render_page", lambda app: ((), {}), clear_page_cache),
+    "weather.draw_page": ("examples/weather.py", "draw_page", lambda app: ((0, 15), {}), forget_weather_frame),
+    "weather.draw_page.dark": ("examples/weather.py", "draw_page", lambda app: ((15, 0), {}), forget_weather_frame),
+    "wlan.draw_list": ("examples/wlan.py", "draw_list", lambda app: ((
+        app.list_items, 0, app.state["current_item"], app.LIST_PADDING, app.LIST_START,
+        app.LIST_WIDTH, app.LIST_HEIGHT, app.ITEM_SPACING, app.list_columns), {}), nothing),
+    "clock.draw_clock": ("examples/clock.py", "draw_clock", lambda app: ((), {}), nothing),
+    "badge.draw_badge": ("examples/badge.py", "draw_badge", lambda app: ((), {}), nothing),
+    "qrgen.draw_qr_file": ("examples/qrgen.py", "draw_qr_file", lambda app: ((app.state["current_qr"],), {}), nothing),
+}
+
+
+def boot(path):
+    root = scratch_root()
+    write_wifi_config(root, WIFI["ssid"], WIFI["psk"])
+    routes = {}
+    for prefix, name in ROUTES.items():
+        with open(os.path.join(FIXTURES, name), "rb") as f:
+            routes[prefix] = f.read()
+    emu = Emulator(root, networks=[WIFI], routes=routes, verbose=False)
+    emu.run(path)
+    return emu, emu.modules[path[:-3]]
+
+
+def call(emu, function, args, kwargs, prepare, app):
+    prepare(app)
+    before = emu.counts.copy()
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000, dict(sorted((emu.counts - before).items()))
+
+
+def peak_allocation(emu, function, args, kwargs, prepare, app):
+    prepare(app)
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        function(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+
+def bench(name, repeat):
+    path, function_name, arguments, prepare = CASES[name]
+    emu, app = boot(path)
+    function = getattr(app, function_name)
+    args, kwargs = arguments(app)
+
+    first_ms, first_counts = call(emu, function, args, kwargs, prepare, app)
+    times = []
+    counts = first_counts
+    for _ in range(repeat):
+        ms, counts = call(emu, function, args, kwargs, prepare, app)
+        times.append(ms)
+    return {
+        "first": {"ms": round(first_ms, 2), "counts": first_counts},
+        "repeat": {
+            "runs": repeat,
+            "min_ms": round(min(times), 2),
+            "median_ms": round(statistics.median(times), 2),
+            "counts": counts,
+        },
+        "peak_alloc": peak_allocation(emu, function, args, kwargs, prepare, app),
+    }
+
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Badger 2040 W apps' draw functions in the emulator")
+    parser.add_argument("--only", action="append", default=[], help="run the cases starting with this, e.g. ebook")
+    parser.add_argument("--repeat", type=int, default=5, help="calls to time after the first (default 5)")
+    parser.add_argument("-o", "--output", help="write the JSON here rather than to stdout")
+    args = parser.parse_args()
+
+    names = [name for name in CASES if not args.only or any(name.startswith(only) for only in args.only)]
+    results = {
+        "commit": commit(),
+        "python": sys.version.split()[0],
+        "cases": {name: bench(name, max(1, args.repeat)) for name in names},
+    }
+    text = json.dumps(results, indent=1)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
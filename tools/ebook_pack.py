@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# Pre-paginates a book for examples/ebook.py on a PC.
+#
+# The book is normalised to plain ASCII and laid out with the same rules as the
+# badge, for every font and text size the reader offers, using character widths
+# dumped from the badge by tools/font_metrics.py. Copy the .bpk file it writes
+# next to the book in /books and the reader will draw pages straight from it.
+#
+#   python3 tools/ebook_pack.py books/289-0-wind-in-the-willows-abridged.txt --metrics font_metrics.json
+import argparse
+import json
+import struct
+import unicodedata
+
+# These must match examples/ebook.py
+WIDTH = 296
+HEIGHT = 128
+ARROW_WIDTH = 18
+TEXT_PADDING = 4
+TEXT_WIDTH = WIDTH - TEXT_PADDING - TEXT_PADDING - ARROW_WIDTH
+FONTS = ["sans", "gothic", "cursive", "serif"]
+TEXT_SIZES = [5, 6, 7, 8]  # In tenths
+
+PACK_MAGIC = b"BPK1"
+PACK_EXTENSION = ".bpk"
+
+# Replacements for characters the fonts cannot draw. Anything else outside ASCII is
+# decomposed and dropped if it still has no ASCII form
+REPLACEMENTS = {
+    "\u2018": "'", "\u2019": "'", "\u201c": "\"", "\u201d": "\"",
+    "\u2013": "-", "\u2014": "--", "\u2026": "...", "\u00a0": " ",
+}
+
+
+def normalise(text):
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\t", " ")
+    out = []
+    for c in text:
+        if c == "\n" or 32 <= ord(c) < 127:
+            out.append(c)
+        elif ord(c) < 128:
+            out.append(" ")  # Control characters have no glyph
+        elif c in REPLACEMENTS:
+            out.append(REPLACEMENTS[c])
+        else:
+            out.append(unicodedata.normalize("NFKD", c).encode("ascii", "ignore").decode())
+    return "".join(out).encode("ascii")
+
+
+class Metrics:
+    def __init__(self, widths):
+        self.widths = widths
+
+    # Each glyph's width is truncated on its own, as the badge does, and anything without
+    # a glyph is measured as a space
+    def measure(self, word, font, size):
+        table = self.widths[font]
+        return sum(int(table[c - 32 if 32 <= c < 127 else 0] * size) for c in word)
+
+
+# Split the text into words the way WordReader does, yielding each word with its start offset
+# and the offset just past it and its separating space or new line
+def words(text, pos):
+    while True:
+        end = pos
+        while end < len(text) and text[end] not in b" \n":
+            end += 1
+        next_pos = end + 1 if end < len(text) else end
+        yield text[pos:end], pos, next_pos
+        pos = next_pos
+
+
+# Lay out one page from pos, mirroring layout_page() in examples/ebook.py.
+# Returns the rows as (offset, length) pairs and the offset where the next page starts
+def layout_page(text, pos, metrics, font, size):
+    text_spacing = int(34 * size)
+    space = metrics.measure(b" ", font, size)
+    rows = []
+    row = 0
+    line_start = -1
+    line_end = 0
+    line_length = 0
+    add_newline = False
+
+    for raw_word, word_pos, next_pos in words(text, pos):
+        pos = word_pos
+        next_word = raw_word.strip()
+        if len(next_word) == 0:
+            add_newline = True
+
+        appended_length = line_length
+        if len(next_word) > 0:
+            if line_start >= 0:
+                appended_length += space
+            appended_length += metrics.measure(next_word, font, size)
+
+        if appended_length >= TEXT_WIDTH or add_newline:
+            if line_start >= 0:
+                rows.append((line_start, line_end - line_start))
+            else:
+                rows.append((pos, 0))
+            row += 1
+
+            if (row * text_spacing) + text_spacing >= HEIGHT:
+                return rows, pos
+
+            if len(next_word) > 0:
+                line_start = pos
+                line_end = pos + len(raw_word)
+                line_length = metrics.measure(next_word, font, size)
+            else:
+                line_start = -1
+                line_length = 0
+            pos = next_pos
+
+            if add_newline:
+                rows.append((pos, 0))
+                row += 1
+                if (row * text_spacing) + text_spacing >= HEIGHT:
+                    return rows, pos
+                add_newline = False
+        else:
+            if len(next_word) > 0:
+                if line_start < 0:
+                    line_start = pos
+                line_end = pos + len(raw_word)
+            line_length = appended_length
+            pos = next_pos
+
+
+def paginate(text, metrics, font, size):
+    pages = []
+    pos = 0
+    while pos < len(text):
+        rows, next_pos = layout_page(text, pos, metrics, font, size)
+        pages.append(rows)
+        if next_pos <= pos:
+            break
+        pos = next_pos
+    return pages
+
+
+# File layout: header, normalised text, then for each layout its packed rows followed by a page
+# table of (pages + 1) uint32 offsets, each pointing at the first row of a page
+def pack(text, layouts):
+    header_size = len(PACK_MAGIC) + 1 + len(layouts) * 10
+    text_start = header_size
+    out = bytearray()
+    entries = []
+    offset = text_start + len(text)
+    for font_idx, size, pages in layouts:
+        blocks = []
+        for rows in pages:
+            blocks.append(offset + len(out))
+            for row_offset, length in rows:
+                out += struct.pack("<IH", text_start + row_offset, length)
+        blocks.append(offset + len(out))
+        table = offset + len(out)
+        for block in blocks:
+            out += struct.pack("<I", block)
+        entries.append((font_idx, size, table, len(pages)))
+
+    header = bytearray(PACK_MAGIC)
+    header.append(len(entries))
+    for entry in entries:
+        header += struct.pack("<BBII", *entry)
+    return bytes(header) + text + bytes(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-paginate a book for the Badger 2040 W ebook reader")
+    parser.add_argument("book", help="UTF-8 text file")
+    parser.add_argument("--metrics", required=True, help="font_metrics.json dumped from the badge")
+    parser.add_argument("-o", "--output", help="output file (defaults to the book with a .bpk extension)")
+    args = parser.parse_args()
+
+    with open(args.book, encoding="utf-8") as f:
+        text = normalise(f.read())
+    with open(args.metrics) as f:
+        metrics = Metrics(json.load(f))
+
+    layouts = []
+    for font_idx, font in enumerate(FONTS):
+        for size in TEXT_SIZES:
+            layouts.append((font_idx, size, paginate(text, metrics, font, size / 10)))
+
+    output = args.output
+    if output is None:
+        output = args.book[:-4] if args.book.endswith(".txt") else args.book
+        output += PACK_EXTENSION
+    with open(output, "wb") as f:
+        f.write(pack(text, layouts))
+
+    for font_idx, size, pages in layouts:
+        print("{} {:.1f}: {} pages".format(FONTS[font_idx], size / 10, len(pages)))
+    print("Wrote {}".format(output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+# Dumps the width of every printable ASCII character in the ebook fonts.
+# Run this on the badge (for example with "mpremote run tools/font_metrics.py")
+# and save what it prints as font_metrics.json for tools/ebook_pack.py
+import json
+import badger2040
+
+FONTS = ["sans", "gothic", "cursive", "serif"]
+
+display = badger2040.Badger2040()
+
+metrics = {}
+for font in FONTS:
+    display.set_font(font)
+    metrics[font] = [display.measure_text(chr(c), 1.0) for c in range(32, 127)]
+
+print(json.dumps(metrics))
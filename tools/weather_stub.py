@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# Serves the canned Open-Meteo responses in tools/fixtures over plain HTTP, so the weather
+# app can be tried without the real API: on a badge on the same network, or in the emulator.
+#
+#   python3 tools/weather_stub.py --port 8000 --delay air-quality=20
+#
+# then set FORECAST_API and AIR_QUALITY_API in examples/weather.py to
+# http://<this machine>:8000/v1/forecast and http://<this machine>:8000/v1/air-quality.
+# --delay holds back an endpoint's response, to see the page drawn without it when it times out.
+import argparse
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# endpoint name: (path, fixture)
+ENDPOINTS = {
+    "forecast": ("/v1/forecast", "open-meteo-forecast.json"),
+    "air-quality": ("/v1/air-quality", "open-meteo-air-quality.json"),
+}
+
+
+def handler(delays):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            for name, (endpoint, fixture) in ENDPOINTS.items():
+                if path == endpoint:
+                    break
+            else:
+                self.send_error(404)
+                return
+            with open(os.path.join(FIXTURES, fixture), "rb") as f:
+                body = f.read()
+            time.sleep(delays.get(name, 0))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def delay(text):
+    name, _, seconds = text.partition("=")
+    if name not in ENDPOINTS:
+        raise argparse.ArgumentTypeError("endpoint must be one of {}".format(", ".join(ENDPOINTS)))
+    return name, float(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve canned Open-Meteo responses for the weather app")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on (default all)")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--delay", type=delay, action="append", default=[], metavar="ENDPOINT=SECONDS",
+                        help="wait this long before answering forecast or air-quality requests")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), handler(dict(args.delay)))
+    print("Serving {} on port {}".format(", ".join(path for path, _ in ENDPOINTS.values()), args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()